@@ -0,0 +1,106 @@
+import argparse
+import json
+import math
+import statistics
+import numpy as np
+from ai_2048 import AI2048, load_config_file
+from shared_tables import share_row_tables
+
+
+def play_pair(task):
+    config_a, config_b, seed = task
+    return AI2048(config_a).play_headless(seed), AI2048(config_b).play_headless(seed)
+
+
+def paired_interval(differences, z):
+    n = len(differences)
+    mean = float(np.mean(differences))
+    if n < 2:
+        return mean, -math.inf, math.inf
+    half_width = z * float(np.std(differences, ddof=1)) / math.sqrt(n)
+    return mean, mean - half_width, mean + half_width
+
+
+class PairedComparison:
+    def __init__(self, tile_target=2048):
+        self.tile_target = tile_target
+        self.pairs = []
+
+    def add(self, seed, result_a, result_b):
+        self.pairs.append((seed, result_a, result_b))
+
+    def score_differences(self):
+        return [a[0] - b[0] for _, a, b in self.pairs]
+
+    def tile_differences(self):
+        return [int(a[1] >= self.tile_target) - int(b[1] >= self.tile_target) for _, a, b in self.pairs]
+
+    def report(self, z):
+        score_mean, score_low, score_high = paired_interval(self.score_differences(), z)
+        tile_mean, tile_low, tile_high = paired_interval(self.tile_differences(), z)
+        return {
+            'games': len(self.pairs),
+            'mean_score_a': float(np.mean([a[0] for _, a, _ in self.pairs])),
+            'mean_score_b': float(np.mean([b[0] for _, _, b in self.pairs])),
+            'score_difference': score_mean,
+            'score_interval': [score_low, score_high],
+            f'rate_{self.tile_target}_a': float(np.mean([a[1] >= self.tile_target for _, a, _ in self.pairs])),
+            f'rate_{self.tile_target}_b': float(np.mean([b[1] >= self.tile_target for _, _, b in self.pairs])),
+            'rate_difference': tile_mean,
+            'rate_interval': [tile_low, tile_high],
+            'significant': score_low > 0 or score_high < 0
+        }
+
+
+def compare(config_a, config_b, min_games, max_games, batch_size, confidence, tile_target, seed, processes,
+            log=print):
+    # Every interim look spends part of the error rate (Bonferroni), so
+    # stopping at the first significant look keeps the overall rate.
+    looks = 1 + max(0, math.ceil((max_games - min_games) / batch_size))
+    z = statistics.NormalDist().inv_cdf(1 - (1 - confidence) / (2 * looks))
+    comparison = PairedComparison(tile_target)
+    next_seed = seed
+    with share_row_tables([config_a['grid_size'], config_b['grid_size']]) as tables, tables.pool(processes) as pool:
+        while len(comparison.pairs) < max_games:
+            games = min_games if not comparison.pairs else batch_size
+            games = min(games, max_games - len(comparison.pairs))
+            seeds = range(next_seed, next_seed + games)
+            next_seed += games
+            for game_seed, (result_a, result_b) in zip(seeds, pool.map(play_pair, [(config_a, config_b, s) for s in seeds])):
+                comparison.add(game_seed, result_a, result_b)
+            report = comparison.report(z)
+            low, high = report['score_interval']
+            log(f"{report['games']:5d} pairs: score A - B = {report['score_difference']:+.0f} "
+                f"[{low:+.0f}, {high:+.0f}]")
+            if report['significant']:
+                break
+    return comparison.report(z)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Paired A/B comparison of two agent configs on common seeds")
+    parser.add_argument('config_a')
+    parser.add_argument('config_b')
+    parser.add_argument('--min-games', type=int, default=20)
+    parser.add_argument('--max-games', type=int, default=500)
+    parser.add_argument('--batch-size', type=int, default=20)
+    parser.add_argument('--confidence', type=float, default=0.95)
+    parser.add_argument('--tile-target', type=int, default=2048)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--output', help="write the final report as JSON")
+    args = parser.parse_args()
+
+    report = compare(load_config_file(args.config_a), load_config_file(args.config_b), args.min_games,
+                     args.max_games, args.batch_size, args.confidence, args.tile_target, args.seed,
+                     args.processes)
+    low, high = report['rate_interval']
+    print(f"{args.tile_target} rate A - B = {report['rate_difference']:+.3f} [{low:+.3f}, {high:+.3f}]")
+    if report['significant']:
+        winner = args.config_a if report['score_difference'] > 0 else args.config_b
+        print(f"{winner} scores higher after {report['games']} paired games")
+    else:
+        print(f"No significant score difference after {report['games']} paired games")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
@@ -1,36 +1,26 @@
-from game_2048 import *
+from board_2048 import move_mask, mask_actions, get_successors, snake_weights
+from depth_2048 import DepthController
+from visual_2048 import PROGRESS_DEPTH, PROGRESS_MOVE, VisualRunner
 import numpy as np
-import json
-import sys
+import time
 
 class AI2048:
-    def __init__(self, game):
-        self.game = game
-        self.weight_matrix = np.array([
-            [65536, 32768, 16384, 8192],
-            [512, 1024, 2048, 4096],
-            [256, 128, 64, 32],
-            [2, 4, 8, 16]
-        ])
+    def __init__(self, grid_size=4, latency_target=0.5):
+        self.depth_controller = DepthController(latency_target, min_depth=2, max_depth=6)
+        self.last_depth = 0
+        self.size = grid_size
+        self.weight_matrix = snake_weights(self.size)
 
     def get_empty_cells(self, board):
         empty_cells = []
-        for i in range(4):
-            for j in range(4):
+        for i in range(self.size):
+            for j in range(self.size):
                 if board[i, j] == 0:
-                    empty_cells.append([i, j])
+                    empty_cells.append((i, j))
         return empty_cells
 
     def is_game_over(self, board):
-        for i in range(4):
-            for j in range(4):
-                if board[i, j] == 0:
-                    return False
-                elif i < 3 and board[i, j] == board[i + 1, j]:
-                    return False
-                elif j < 3 and board[i, j] == board[i, j + 1]:
-                    return False
-        return True
+        return move_mask(board) == 0
 
     def copy_board(self, board):
         return board.copy()
@@ -39,13 +29,7 @@ class AI2048:
         return np.array_equal(board1, board2)
 
     def get_valid_moves(self, board):
-        all_moves = ['left', 'right', 'up', 'down']
-        valid_moves = []
-        for move in all_moves:
-            temp_board = self.simulate_move(move, board)
-            if not self.board_equals(temp_board, board):
-                valid_moves.append(move)
-        return valid_moves
+        return mask_actions(move_mask(board))
 
     def simulate_move(self, move, board):
         match move:
@@ -62,7 +46,7 @@ class AI2048:
 
     def simulate_left_move(self, board):
         new_board = self.copy_board(board)
-        for i in range(4):
+        for i in range(self.size):
             row = new_board[i, :]
             non_zero = row[row != 0]
             new_row, j = [], 0
@@ -73,7 +57,7 @@ class AI2048:
                 else:
                     new_row.append(non_zero[j])
                     j += 1
-            while len(new_row) < 4:
+            while len(new_row) < self.size:
                 new_row.append(0)
             new_board[i, :] = new_row
         return new_board
@@ -113,14 +97,14 @@ class AI2048:
 
     def evaluate_merge_score(self, board):
         score = 0
-        for i in range(4):
-            for j in range(3):
+        for i in range(self.size):
+            for j in range(self.size - 1):
                 if board[i, j] == 0:
                     continue
                 if board[i, j] == board[i, j + 1]:
                     score += board[i, j]
-        for i in range(3):
-            for j in range(4):
+        for i in range(self.size - 1):
+            for j in range(self.size):
                 if board[i, j] == 0:
                     continue
                 if board[i, j] == board[i + 1, j]:
@@ -135,13 +119,13 @@ class AI2048:
 
     def evaluate_smoothness(self, board):
         penalty = 0
-        for i in range(4):
-            for j in range(3):
+        for i in range(self.size):
+            for j in range(self.size - 1):
                 if board[i, j] == 0:
                     continue
                 penalty += abs(board[i, j] - board[i, j + 1])
-        for i in range(3):
-            for j in range(4):
+        for i in range(self.size - 1):
+            for j in range(self.size):
                 if board[i, j] == 0:
                     continue
                 penalty += abs(board[i, j] - board[i + 1, j])
@@ -150,30 +134,31 @@ class AI2048:
     def evaluate_distance(self, board):
         penalty = 0
         constant = 30
-        for i in range(4):
-            for j in range(4):
+        for i in range(self.size):
+            for j in range(self.size):
                 if board[i, j] == 0:
                     continue
-                distance = min(i + j, abs(i - 3) + abs(j - 3))
+                distance = min(i + j, abs(i - (self.size - 1)) + abs(j - (self.size - 1)))
                 penalty += board[i, j] * constant * distance
         return penalty
 
     def get_best_move(self, board):
-        if np.max(board) <= 64:
-            depth = 4
-        else:
-            depth = 5
+        depth, features = self.depth_controller.choose_depth(board)
+        self.last_depth = depth
+        start = time.perf_counter()
         _, best_move = self.expectimax(board, depth, True)
+        self.depth_controller.observe(features, depth, time.perf_counter() - start)
         return best_move
 
     def expectimax(self, board, depth, is_player_turn):
-        if depth == 0 or self.is_game_over(board):
+        if depth == 0:
             return self.evaluate_board(board), None
         if is_player_turn:
-            valid_moves = self.get_valid_moves(board)
+            successors = get_successors(board)
+            if not successors:
+                return self.evaluate_board(board), None
             best_value, best_move = -float('inf'), None
-            for move in valid_moves:
-                new_board = self.simulate_move(move, board)
+            for move, new_board in successors:
                 result = self.expectimax(new_board, depth -1, False)
                 value = result[0] if isinstance(result, tuple) else result
                 if value > best_value:
@@ -192,40 +177,31 @@ class AI2048:
                 expected_value += ((0.9 / len(empty_cells)) * value_2) + ((0.1 / len(empty_cells)) * value_4)
             return expected_value
 
-    def solve(self):
-        pygame.init()
-        clock = pygame.time.Clock()
-        while not self.game.is_game_over():
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-            current_board = self.game.get_board()
-            best_move = self.get_best_move(current_board)
-            if best_move:
-                self.game.handle_move(best_move)
-                self.game.draw()
-                clock.tick(2)
-            else:
-                break
-        pygame.quit()
-        return self.game.score, np.max(self.game.board)
+
+def search_worker(config, connection, progress):
+    # VisualRunner's worker protocol, answered by this agent's search.
+    ai = AI2048(config.get('grid_size', 4))
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        move, board = request
+        progress[PROGRESS_MOVE] = move
+        start = time.perf_counter()
+        action = ai.get_best_move(board)
+        progress[PROGRESS_DEPTH] = ai.last_depth
+        connection.send((move, action, ai.last_depth, 0, time.perf_counter() - start))
+
 
 if __name__ == "__main__":
     print("Enter the number of games you want to run: ")
     games = int(input())
     print("Do you want to save your results? (y/n): ")
     save = True if input().split()[0].lower() == 'y' else False
+    output_file = None
     if save:
         print("Enter current config name: ")
-        config_name = input().split()
-    results = {}
-    for i in range(games):
-        game = Game2048()
-        agent = AI2048(game)
-        score, max_tile = agent.solve()
+        output_file = f"{input().split()[0]}.json"
+    runner = VisualRunner({'grid_size': 4}, search=search_worker)
+    for score, max_tile in runner.run(games, output_file=output_file).values():
         print(f"Score: {score}, Max tile: {max_tile}")
-        results[i] = f"Score: {score}, Max tile: {max_tile}"
-    if save:
-        with open(f"{config_name}.json", "w") as f:
-            json.dump(results, f, indent=4)
\ No newline at end of file
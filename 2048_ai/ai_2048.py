@@ -1,231 +1,445 @@
-from game_2048 import *
+from game_2048 import Game2048
+from board_2048 import ACTIONS, MASK_MOVE_COUNTS, MAX_GRID_SIZE, MIN_GRID_SIZE, SearchBoard, snake_weights
+from depth_2048 import DepthController
 import numpy as np
+import copy
 import json
-import sys
+import mmap
+import time
+import zlib
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+DEFAULT_CONFIG = {
+    'algorithm': 'expectimax',
+    'grid_size': 4,
+    'depth': 4,
+    'variable_depth': False,
+    'max_depth': 6,
+    'min_depth': 2,
+    'latency_target': 0.25,
+    'node_budget': None,
+    'memory_budget': None,
+    'chance_samples': None,
+    'reuse_search': True,
+    'ponder': False,
+    'cache_size': 200000,
+    'heuristic_weights': {
+        'empty': 2.5,
+        'smooth': 0.1,
+        'formation': 1.0
+    },
+    'save_results': True,
+    'output_file': 'results.json',
+    'num_games': 10
+}
+
+# Same relative scales as agent_2048.evaluate_board, taken against the
+# unscaled formation score.
+EMPTY_SCALE = 64 * 30
+SMOOTH_SCALE = 40 * 30
+
+MEMORY_CHECK_INTERVAL = 256
+PROGRESS_INTERVAL = 1024
+
+
+def load_config_file(path=None):
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    if path:
+        with open(path, 'r') as f:
+            config.update(json.load(f))
+    return config
+
+
+def resident_memory():
+    # Current resident set size, or None where it cannot be read. The rusage
+    # peak would be the lifetime high water mark, which never comes down
+    # once the budget has been crossed.
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * mmap.PAGESIZE
+    except (OSError, ValueError, IndexError):
+        pass
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    return None
 
 class AI2048:
     def __init__(self, config):
-        self.weight_matrix = np.array([
-            [65536, 32768, 16384, 8192],
-            [512, 1024, 2048, 4096],
-            [256, 128, 64, 32],
-            [2, 4, 8, 16]
-        ])
-        self.game = None
+        self.grid_size = config.get('grid_size', DEFAULT_CONFIG['grid_size'])
+        if not MIN_GRID_SIZE <= self.grid_size <= MAX_GRID_SIZE:
+            raise ValueError(f"grid_size must be between {MIN_GRID_SIZE} and {MAX_GRID_SIZE}")
+        self.weight_matrix = snake_weights(self.grid_size)
         self.algo = config['algorithm']
         self.depth = config['depth']
         self.var_depth = config['variable_depth']
         self.max_depth = config['max_depth']
         self.min_depth = config['min_depth']
-        self.save_results = config['save_results']
-        self.output_file = config['output_file']
-        self.num_games = config['num_games']
-
-    def get_empty_tiles(self, board):
-        empty_tiles = []
-        for i in range(4):
-            for j in range(4):
-                if board[i, j] == 0:
-                    empty_tiles.append([i, j])
-        return empty_tiles
-
-    def game_over(self, board):
-        for i in range(4):
-            for j in range(4):
-                if board[i, j] == 0:
-                    return False
-                elif i < 3 and board[i, j] == board[i + 1, j]:
-                    return False
-                elif j < 3 and board[i, j] == board[i, j + 1]:
-                    return False
-        return True
+        self.depth_controller = DepthController(config.get('latency_target', DEFAULT_CONFIG['latency_target']),
+                                                self.min_depth, self.max_depth)
+        # Missing weights take the same defaults load_config_file and the
+        # config GUI fill in; set empty and smooth to 0 for formation only.
+        self.heuristic_weights = dict(DEFAULT_CONFIG['heuristic_weights'], **config.get('heuristic_weights', {}))
+        self.node_budget = config.get('node_budget')
+        self.memory_budget = config.get('memory_budget')
+        if self.memory_budget and resident_memory() is None:
+            raise RuntimeError("memory_budget needs /proc/self/statm or psutil to measure memory")
+        self.nodes = 0
+        self.node_limit = float('inf')
+        self.chance_samples = config.get('chance_samples')
+        self.reuse_search = config.get('reuse_search', True)
+        self.cache_size = config.get('cache_size', DEFAULT_CONFIG['cache_size'])
+        self.cache = {}
+        self.cache_algorithm = None
+        self.generation = 0
+        self.truncations = 0
+        self.weight_cells = self.weight_matrix.reshape(-1)
+        self.search_board = SearchBoard(max(self.depth, self.max_depth), self.grid_size)
+        self.root_depth = 0
+        self.root_action = None
+        self.last_depth = self.depth
+        self.ponder = config.get('ponder', False)
+        # Called with the node count every PROGRESS_INTERVAL nodes.
+        self.progress = None
 
-    def get_actions(self, board):
-        all_actions = ['up', 'down', 'left', 'right']
-        actions = []
-        for action in all_actions:
-            temp = self.execute_action(action, board)
-            if not np.array_equal(temp, board):
-                actions.append(action)
-        return actions
-
-    def execute_action(self, action, board):
-        match action:
-            case 'left':
-                return self.execute_left(board)
-            case 'right':
-                return self.execute_right(board)
-            case 'up':
-                return self.execute_up(board)
-            case 'down':
-                return self.execute_down(board)
-            case _:
-                return None
-
-    def execute_left(self, board):
-        new_board = board.copy()
-        for i in range(4):
-            row = new_board[i, :]
-            non_zero = row[row != 0]
-            new_row, j = [], 0
-            while j < len(non_zero):
-                if j < len(non_zero) - 1 and non_zero[j] == non_zero[j + 1]:
-                    new_row.append(2 * non_zero[j])
-                    j += 2
-                else:
-                    new_row.append(non_zero[j])
-                    j += 1
-            while len(new_row) < 4:
-                new_row.append(0)
-            new_board[i, :] = new_row
-        return new_board
-
-    def execute_right(self, board):
-        new_board = board.copy()
-        new_board = np.fliplr(new_board)
-        new_board = self.execute_left(new_board)
-        return np.fliplr(new_board)
-
-    def execute_up(self, board):
-        new_board = board.copy()
-        new_board = new_board.T
-        new_board = self.execute_left(new_board)
-        return new_board.T
-
-    def execute_down(self, board):
-        new_board = board.copy()
-        new_board = new_board.T
-        new_board = self.execute_right(new_board)
-        return new_board.T
-
-    def place_tile(self, board, tile, value):
-        new_board = board.copy()
-        new_board[tile] = value
-        return new_board
-
-    def evaluate_board(self, board):
-        if self.game_over(board):
+    def chance_tiles(self, empty, count):
+        if self.chance_samples is None or count <= self.chance_samples:
+            return self.search_board.all_cells
+        # Spawns beside the largest tile are the ones that can wreck a corner
+        # formation, so they are always searched; the rest are sampled one
+        # per stratum of neighbouring cells and weighted by stratum size.
+        # Many tiles can tie for largest early on, so only the one nearest a
+        # corner counts, and its neighbours take slots from the sample.
+        search_board = self.search_board
+        cells = search_board.cells
+        largest = cells.max()
+        anchor = min((cell for cell in range(search_board.cell_count) if cells[cell] == largest),
+                     key=search_board.corner_distance.__getitem__)
+        slots = max(self.chance_samples, 1)
+        # One slot always stays for the rest of the board.
+        forced = [cell for cell in search_board.neighbours[anchor] if empty[cell]][:slots - 1]
+        rest = [cell for cell in range(search_board.cell_count) if empty[cell] and cell not in forced]
+        slots -= len(forced)
+        forced = [(cell, 1) for cell in forced]
+        if len(rest) <= slots:
+            return forced + [(cell, 1) for cell in rest]
+        # Seeded from the position, so a board gets the same sample whatever
+        # was searched before it, in this process or any other.
+        rng = np.random.default_rng(zlib.crc32(search_board.key()))
+        sampled = []
+        for stratum in np.array_split(np.arange(len(rest)), slots):
+            sampled.append((rest[stratum[rng.integers(len(stratum))]], len(stratum)))
+        return forced + sampled
+
+    def evaluate_search_board(self, ply):
+        search_board = self.search_board
+        empty = search_board.empty_count()
+        if empty == 0 and search_board.move_mask(ply) == 0:
             return -float('inf')
-        formation = self.formation_score(board)
-        return formation
+        weights = self.heuristic_weights
+        value = weights['formation'] * np.dot(search_board.tile_values(), self.weight_cells)
+        if weights['empty']:
+            value += weights['empty'] * EMPTY_SCALE * empty * search_board.max_value()
+        if weights['smooth']:
+            value -= weights['smooth'] * SMOOTH_SCALE * search_board.smoothness()
+        return value
 
-    def formation_score(self, board):
-        return np.sum(np.multiply(board, self.weight_matrix))
+    def select_action(self, board, algorithm, depth, pondered=False):
+        if not self.var_depth:
+            self.last_depth = depth
+            return self.get_best_action(board, algorithm, depth)
+        depth, features = self.depth_controller.choose_depth(board)
+        self.last_depth = depth
+        start = time.perf_counter()
+        best_action = self.get_best_action(board, algorithm, depth)
+        # A root answered from the cache, or a position the ponderer already
+        # searched, says nothing about what a search to this depth costs.
+        if self.nodes and not pondered:
+            self.depth_controller.observe(features, depth, time.perf_counter() - start)
+        return best_action
 
-    def empty_score(self, board):
-        return len(self.get_empty_tiles(board))
+    def start_search(self, algorithm):
+        self.generation += 1
+        if algorithm != self.cache_algorithm:
+            self.cache.clear()
+            self.cache_algorithm = algorithm
+        if len(self.cache) > self.cache_size:
+            # Positions neither stored nor hit in the last two searches are
+            # rarely reached again.
+            oldest = self.generation - 2
+            self.cache = {key: entry for key, entry in self.cache.items() if entry[0] >= oldest}
+            if len(self.cache) > self.cache_size:
+                self.cache.clear()
 
-    def get_best_action(self, board, algorithm, depth):
+    # Values are cached per (board, node type) with the depth they were
+    # searched to, and the cache outlives a single move: the position after
+    # the next spawn was a node of the previous search. An entry answers any
+    # request for the same or a shallower depth. Values from subtrees cut
+    # short by the node budget are kept at depth 0, which only serves as a
+    # better fallback than the static evaluation when the budget runs out.
+    def cache_entry(self, max_node):
+        if not self.reuse_search:
+            return None, None
+        key = self.search_board.key()
+        return key, self.cache.get((key, max_node))
+
+    def cached_value(self, entry, ply):
+        if ply == 0:
+            self.root_action = entry[3]
+        return entry[2]
+
+    def cache_hit(self, key, max_node, entry, ply):
+        # An entry that answers a search counts as touched by it.
+        if entry[0] != self.generation:
+            self.cache[key, max_node] = (self.generation,) + entry[1:]
+        return self.cached_value(entry, ply)
+
+    def cut_short(self, entry):
+        # Expanded earlier in this search, but not to full depth.
+        return entry is not None and entry[0] == self.generation and entry[1] == 0
+
+    def store(self, key, max_node, depth, truncations, value, action):
+        if key is not None:
+            exact_depth = depth if truncations == self.truncations else 0
+            self.cache[key, max_node] = (self.generation, exact_depth, value, action)
+        return value
+
+    def search(self, board, algorithm, depth):
+        self.start_search(algorithm)
+        return self.search_position(board, algorithm, depth)
+
+    def search_position(self, board, algorithm, depth):
+        self.nodes = 0
+        budget = float('inf')
+        if self.node_budget is not None:
+            # The root is always expanded so a legal move comes back.
+            budget = max(self.node_budget, 1)
+        self.node_limit = budget
+        self.search_board.resize(depth)
+        self.search_board.load(board)
+        self.root_depth = depth
+        truncations = self.truncations
+        value = self.run_search(algorithm, depth, budget)
+        if value is None:
+            return None, None
+        if (self.truncations != truncations and self.reuse_search and algorithm != 'alphabeta'
+                and self.nodes < self.node_limit):
+            # The split cut lines short but left nodes unspent. They go to
+            # those lines in search order: what the first pass finished is
+            # cached and what it cut short is expanded again for free, so a
+            # budget that covers the tree gives the exact search.
+            value = self.run_search(algorithm, depth, float('inf'))
+        return value, self.root_action
+
+    def run_search(self, algorithm, depth, budget):
+        self.root_action = None
         match algorithm:
             case "expectimax":
-                return self.expectimax(board, depth, True)[1]
+                return self.expectimax(depth, True, budget)
             case "minimax":
-                return self.minimax(board, depth, True)[1]
+                return self.minimax(depth, True, budget)
             case "alphabeta":
-                return self.alphabeta(board, depth, True, -float('inf'), float('inf'))[1]
-            case _:
-                return None
+                return self.alphabeta(depth, True, -float('inf'), float('inf'), budget)
+        return None
 
-    def expectimax(self, board, depth, max_node):
-        if depth == 0 or self.game_over(board):
-            return self.evaluate_board(board), None
+    def get_best_action(self, board, algorithm, depth):
+        return self.search(board, algorithm, depth)[1]
+
+    def can_expand(self, budget):
+        if budget < 1 or self.nodes >= self.node_limit:
+            self.truncations += 1
+            return False
+        if (self.memory_budget and self.nodes and self.nodes % MEMORY_CHECK_INTERVAL == 0
+                and resident_memory() > self.memory_budget):
+            self.node_limit = self.nodes
+            self.truncations += 1
+            return False
+        self.nodes += 1
+        if self.progress is not None and self.nodes % PROGRESS_INTERVAL == 0:
+            self.progress(self.nodes)
+        return True
+
+    # The searches below work on self.search_board: moves and spawns are
+    # made on it in place and undone before returning, so a node returns
+    # only its value and the root's choice is left in self.root_action.
+    #
+    # They take a node budget that is split between children; for
+    # expectimax in proportion to their probability, otherwise evenly, out
+    # of what the earlier siblings left unspent. Nodes
+    # whose share drops below one, or reached after the whole search hit its
+    # limit, are scored with the static evaluation instead of expanded.
+    # Positions cut short earlier in the same search are not charged again.
+    def expectimax(self, depth, max_node, budget=float('inf')):
+        ply = self.root_depth - depth
+        if depth == 0:
+            return self.evaluate_search_board(ply)
+        key, entry = self.cache_entry(max_node)
+        if entry is not None and entry[1] >= depth:
+            return self.cache_hit(key, max_node, entry, ply)
+        if not (self.cut_short(entry) or self.can_expand(budget)):
+            if entry is not None:
+                return self.cached_value(entry, ply)
+            return self.evaluate_search_board(ply)
+        budget -= 1
+        truncations = self.truncations
+        search_board = self.search_board
         if max_node:
-            actions = self.get_actions(board)
+            mask = search_board.move_mask(ply)
+            if not mask:
+                return -float('inf')
+            children = MASK_MOVE_COUNTS[mask]
             max_value, max_action = -float('inf'), None
-            for action in actions:
-                new_board = self.execute_action(action, board)
-                value = self.expectimax(new_board, depth - 1, False)[0]
-                if value > max_value:
-                    max_value, max_action = value, action
-            return max_value, max_action
+            for index in range(4):
+                if mask & (1 << index):
+                    search_board.make_move(ply, index)
+                    nodes = self.nodes
+                    value = self.expectimax(depth - 1, False, budget / children)
+                    budget -= self.nodes - nodes
+                    children -= 1
+                    search_board.unmake_move(ply)
+                    if max_action is None or value > max_value:
+                        max_value, max_action = value, ACTIONS[index]
+            if ply == 0:
+                self.root_action = max_action
+            return self.store(key, max_node, depth, truncations, max_value, max_action)
         else:
-            empty_tiles = self.get_empty_tiles(board)
+            empty = search_board.empty_cells(ply)
+            count = search_board.empty_count()
             expected_value = 0
-            for tile in empty_tiles:
-                board_2 = self.place_tile(board, tile, 2)
-                board_4 = self.place_tile(board, tile, 4)
-                value_2 = self.expectimax(board_2, depth - 1, True)[0]
-                value_4 = self.expectimax(board_4, depth - 1, True)[0]
-                probability_2 = (0.9 / len(empty_tiles))
-                probability_4 = (0.1 / len(empty_tiles))
-                expected_value += ((value_2 * probability_2) + (value_4 * probability_4))
-            return expected_value, None
-
-    def minimax(self, board, depth, max_node):
-        if depth == 0 or self.game_over(board):
-            return self.evaluate_board(board), None
+            probability_2 = (0.9 / count)
+            probability_4 = (0.1 / count)
+            # Every 2 is searched before any 4, so the likelier spawns go
+            # first and whatever they leave unspent reaches the 4s. Sampled
+            # cells carry the weight of their stratum, so the probability
+            # still unsearched starts at one.
+            tiles = self.chance_tiles(empty, count)
+            unsearched = 1.0
+            for exponent, probability in ((1, probability_2), (2, probability_4)):
+                for cell, weight in tiles:
+                    if not empty[cell]:
+                        continue
+                    search_board.place(cell, exponent)
+                    nodes = self.nodes
+                    value = self.expectimax(depth - 1, True, budget * min(probability * weight / unsearched, 1))
+                    budget -= self.nodes - nodes
+                    unsearched -= probability * weight
+                    search_board.clear(cell)
+                    expected_value += weight * probability * value
+            return self.store(key, max_node, depth, truncations, expected_value, None)
+
+    def minimax(self, depth, max_node, budget=float('inf')):
+        ply = self.root_depth - depth
+        if depth == 0:
+            return self.evaluate_search_board(ply)
+        key, entry = self.cache_entry(max_node)
+        if entry is not None and entry[1] >= depth:
+            return self.cache_hit(key, max_node, entry, ply)
+        if not (self.cut_short(entry) or self.can_expand(budget)):
+            if entry is not None:
+                return self.cached_value(entry, ply)
+            return self.evaluate_search_board(ply)
+        budget -= 1
+        truncations = self.truncations
+        search_board = self.search_board
         if max_node:
-            actions = self.get_actions(board)
+            mask = search_board.move_mask(ply)
+            if not mask:
+                return -float('inf')
+            children = MASK_MOVE_COUNTS[mask]
             max_value, max_action = -float('inf'), None
-            for action in actions:
-                new_board = self.execute_action(action, board)
-                value = self.minimax(new_board, depth - 1, False)[0]
-                if value > max_value:
-                    max_value, max_action = value, action
-            return max_value, max_action
+            for index in range(4):
+                if mask & (1 << index):
+                    search_board.make_move(ply, index)
+                    nodes = self.nodes
+                    value = self.minimax(depth - 1, False, budget / children)
+                    budget -= self.nodes - nodes
+                    children -= 1
+                    search_board.unmake_move(ply)
+                    if max_action is None or value > max_value:
+                        max_value, max_action = value, ACTIONS[index]
+            if ply == 0:
+                self.root_action = max_action
+            return self.store(key, max_node, depth, truncations, max_value, max_action)
         else:
-            empty_tiles = self.get_empty_tiles(board)
+            empty = search_board.empty_cells(ply)
             min_value = float('inf')
-            for tile in empty_tiles:
-                board_2 = self.place_tile(board, tile, 2)
-                value_2 = self.minimax(board_2, depth - 1, True)[0]
-                board_4 = self.place_tile(board, tile, 4)
-                value_4 = self.minimax(board_4, depth - 1, True)[0]
+            children = 2 * search_board.empty_count()
+            for cell in range(search_board.cell_count):
+                if not empty[cell]:
+                    continue
+                search_board.place(cell, 1)
+                nodes = self.nodes
+                value_2 = self.minimax(depth - 1, True, budget / children)
+                budget -= self.nodes - nodes
+                search_board.place(cell, 2)
+                nodes = self.nodes
+                value_4 = self.minimax(depth - 1, True, budget / (children - 1))
+                budget -= self.nodes - nodes
+                children -= 2
+                search_board.clear(cell)
                 min_value = min(min_value, value_2, value_4)
-            return min_value, None
+            return self.store(key, max_node, depth, truncations, min_value, None)
 
-    def alphabeta(self, board, depth, max_node, alpha, beta):
-        if depth == 0 or self.game_over(board):
-            return self.evaluate_board(board), None
+    # Alpha-beta values depend on the search window, so they are not cached.
+    def alphabeta(self, depth, max_node, alpha, beta, budget=float('inf')):
+        ply = self.root_depth - depth
+        if depth == 0 or not self.can_expand(budget):
+            return self.evaluate_search_board(ply)
+        budget -= 1
+        search_board = self.search_board
         if max_node:
-            actions = self.get_actions(board)
+            mask = search_board.move_mask(ply)
+            if not mask:
+                return -float('inf')
+            children = MASK_MOVE_COUNTS[mask]
             max_action = None
-            for action in actions:
-                new_board = self.execute_action(action, board)
-                value = self.alphabeta(new_board, depth - 1, False, alpha, beta)
-                if value > alpha:
-                    alpha = value
-                    max_action = action
-                if alpha > beta:
-                    return None, None
-            return alpha, max_action
+            for index in range(4):
+                if mask & (1 << index):
+                    search_board.make_move(ply, index)
+                    nodes = self.nodes
+                    value = self.alphabeta(depth - 1, False, alpha, beta, budget / children)
+                    budget -= self.nodes - nodes
+                    children -= 1
+                    search_board.unmake_move(ply)
+                    if max_action is None:
+                        max_action = ACTIONS[index]
+                    if value > alpha:
+                        alpha = value
+                        max_action = ACTIONS[index]
+                    if alpha >= beta:
+                        break
+            if ply == 0:
+                self.root_action = max_action
+            return alpha
         else:
-            empty_tiles = self.get_empty_tiles(board)
-            for tile in empty_tiles:
-                board_2 = self.place_tile(board, tile, 2)
-                value_2 = self.alphabeta(board_2, depth - 1, True, alpha, beta)
-                board_4 = self.place_tile(board, tile, 4)
-                value_4 = self.alphabeta(board_4, depth - 1, True, alpha, beta)
+            empty = search_board.empty_cells(ply)
+            children = 2 * search_board.empty_count()
+            for cell in range(search_board.cell_count):
+                if not empty[cell]:
+                    continue
+                search_board.place(cell, 1)
+                nodes = self.nodes
+                value_2 = self.alphabeta(depth - 1, True, alpha, beta, budget / children)
+                budget -= self.nodes - nodes
+                search_board.place(cell, 2)
+                nodes = self.nodes
+                value_4 = self.alphabeta(depth - 1, True, alpha, beta, budget / (children - 1))
+                budget -= self.nodes - nodes
+                children -= 2
+                search_board.clear(cell)
                 beta = min(beta, value_2, value_4)
-                if alpha > beta:
-                    return None, None
-            return beta, None
-
-    def play(self, algorithm_choice, depth_choice):
-        pygame.init()
-        clock = pygame.time.Clock()
-        while not self.game.is_game_over():
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    pygame.quit()
-                    sys.exit()
-            current_board = self.game.get_board()
-            best_action = self.get_best_action(current_board, algorithm_choice, depth_choice)
-            if best_action:
-                self.game.handle_move(best_action)
-                self.game.draw()
-                clock.tick(2)
-            else:
+                if alpha >= beta:
+                    break
+            return beta
+
+    def play_headless(self, seed=None):
+        game = Game2048(render=False, seed=seed, grid_size=self.grid_size)
+        while not game.is_game_over():
+            best_action = self.select_action(game.get_board(), self.algo, self.depth)
+            if not best_action:
                 break
-        pygame.quit()
-        return self.game.score, np.max(self.game.board)
-
-    def run(self):
-        results = {}
-        for i in range(self.num_games):
-            self.game = Game2048()
-            score, max_tile = self.play(self.algo, self.depth)
-            results[i] = (score, max_tile)
-        if self.save_results:
-            with open(self.output_file, 'w') as f:
-                json.dump(results, f)
+            game.handle_move(best_action)
+        return int(game.score), int(np.max(game.board))
@@ -4,6 +4,8 @@ import json
 from typing import Dict, Any
 from game_2048 import *
 from ai_2048 import *
+from board_2048 import MIN_GRID_SIZE, MAX_GRID_SIZE
+from visual_2048 import VisualRunner
 
 class AI2048ConfigGUI:
     def __init__(self):
@@ -13,10 +15,13 @@ class AI2048ConfigGUI:
 
         self.config = {
             'algorithm': tk.StringVar(value='expectimax'),
+            'grid_size': tk.IntVar(value=4),
             'depth': tk.IntVar(value=4),
             'variable_depth': tk.BooleanVar(value=False),
+            'ponder': tk.BooleanVar(value=False),
             'max_depth': tk.IntVar(value=6),
             'min_depth': tk.IntVar(value=2),
+            'latency_target': tk.DoubleVar(value=0.25),
             'heuristic_weights': {
                 'empty': tk.DoubleVar(value=2.5),
                 'smooth': tk.DoubleVar(value=0.1),
@@ -59,6 +64,15 @@ class AI2048ConfigGUI:
                             variable=self.config['algorithm'],
                             value=algo).pack(anchor=tk.W)
 
+        size_frame = ttk.Frame(parent)
+        size_frame.pack(fill=tk.X, padx=10, pady=(10, 0))
+        ttk.Label(size_frame, text="Board Size:").pack(side=tk.LEFT)
+        ttk.Spinbox(size_frame, from_=MIN_GRID_SIZE, to=MAX_GRID_SIZE, width=10,
+                    textvariable=self.config['grid_size']).pack(side=tk.RIGHT)
+
+        ttk.Checkbutton(parent, text="Search ahead while moves are shown",
+                        variable=self.config['ponder']).pack(anchor=tk.W, padx=10, pady=(5, 0))
+
         ttk.Separator(parent, orient=tk.HORIZONTAL).pack(fill=tk.X, pady=20)
         ttk.Label(parent, text="Depth Configuration:", font=('Arial', 10, 'bold')).pack(anchor=tk.W, pady=(0,5))
 
@@ -90,6 +104,12 @@ class AI2048ConfigGUI:
         ttk.Spinbox(max_frame, from_=2, to=10, width=10,
                     textvariable=self.config['max_depth']).pack(side=tk.RIGHT)
 
+        latency_frame = ttk.Frame(self.var_depth_frame)
+        latency_frame.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(latency_frame, text="Latency Target (s):").pack(side=tk.LEFT)
+        ttk.Spinbox(latency_frame, from_=0.01, to=60.0, increment=0.05, width=10,
+                    textvariable=self.config['latency_target']).pack(side=tk.RIGHT)
+
         self.toggle_variable_depth()
 
     def create_heuristics_tab(self, parent):
@@ -124,7 +144,7 @@ class AI2048ConfigGUI:
             var.set(round(float(val), 2)))
 
         info_label = ttk.Label(heur_frame,
-                               text="Note: Current AI only uses Formation weight.\nOther weights are for future enhancements.",
+                               text="Note: Weights are relative; only their ratios matter.\nUse tune_2048.py to search for good values.",
                                font=('Arial', 8), foreground='gray')
         info_label.pack(pady=10)
 
@@ -208,10 +228,13 @@ class AI2048ConfigGUI:
     def get_config_dict(self) -> Dict[str, Any]:
         return {
             'algorithm': self.config['algorithm'].get(),
+            'grid_size': self.config['grid_size'].get(),
             'depth': self.config['depth'].get(),
             'variable_depth': self.config['variable_depth'].get(),
+            'ponder': self.config['ponder'].get(),
             'max_depth': self.config['max_depth'].get(),
             'min_depth': self.config['min_depth'].get(),
+            'latency_target': self.config['latency_target'].get(),
             'heuristic_weights': {
                 key: var.get() for key, var in self.config['heuristic_weights'].items()
             },
@@ -231,10 +254,13 @@ class AI2048ConfigGUI:
 
                 # Update GUI with loaded config
                 self.config['algorithm'].set(config_data.get('algorithm', 'expectimax'))
+                self.config['grid_size'].set(config_data.get('grid_size', 4))
                 self.config['depth'].set(config_data.get('depth', 4))
                 self.config['variable_depth'].set(config_data.get('variable_depth', False))
+                self.config['ponder'].set(config_data.get('ponder', False))
                 self.config['max_depth'].set(config_data.get('max_depth', 6))
                 self.config['min_depth'].set(config_data.get('min_depth', 2))
+                self.config['latency_target'].set(config_data.get('latency_target', 0.25))
 
                 heur_weights = config_data.get('heuristic_weights', {})
                 for key, var in self.config['heuristic_weights'].items():
@@ -267,10 +293,13 @@ class AI2048ConfigGUI:
 
     def reset_all(self):
         self.config['algorithm'].set('expectimax')
+        self.config['grid_size'].set(4)
         self.config['depth'].set(4)
         self.config['variable_depth'].set(False)
+        self.config['ponder'].set(False)
         self.config['max_depth'].set(6)
         self.config['min_depth'].set(2)
+        self.config['latency_target'].set(0.25)
         self.config['save_results'].set(True)
         self.config['output_file'].set('results.json')
         self.config['num_games'].set(10)
@@ -284,12 +313,13 @@ class AI2048ConfigGUI:
         print(json.dumps(config, indent=2))
 
         try:
-            agent = AI2048(config)
+            runner = VisualRunner(config)
 
             messagebox.showinfo("Agent Starting",
                                 f"Starting {config['num_games']} games with {config['algorithm']} algorithm!")
 
-            agent.run()
+            output_file = config['output_file'] if config['save_results'] else None
+            runner.run(config['num_games'], output_file=output_file)
 
             messagebox.showinfo("Agent Complete",
                                 f"Completed {config['num_games']} games! Check {config['output_file']} for results.")
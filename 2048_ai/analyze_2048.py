@@ -0,0 +1,155 @@
+import argparse
+import collections
+import itertools
+import json
+import math
+import sys
+import time
+import numpy as np
+from ai_2048 import AI2048, load_config_file
+from board_2048 import DENSE_ROW_LENGTH, MAX_GRID_SIZE, MIN_GRID_SIZE, snake_weights
+from shared_tables import share_row_tables
+
+# Boards are read one per line, as any of:
+#   [[2, 4, 0, 0], [0, 0, 0, 0], ...]      nested rows
+#   [2, 4, 0, 0, 0, 0, ...]                flat, row-major
+#   2 4 0 0 0 0 ...                        whitespace or comma separated
+#   {"board": [...], "id": "case-17"}      any other fields are echoed back
+# Each board produces one JSON line on the output, in input order.
+
+# Boards are held as int32.
+MAX_TILE = 1 << 30
+
+_agents = {}
+
+
+def max_tile(size):
+    # The formation score sums tile * weight in int64. Merges keep the
+    # total of the tiles, so that total times the largest weight has to fit
+    # however the search rearranges them.
+    limit = min(MAX_TILE, (2 ** 63 - 1) // (size * size * int(snake_weights(size).max())))
+    return 1 << (limit.bit_length() - 1)
+
+
+def parse_board(line):
+    text = line.strip()
+    fields = {}
+    if text.startswith('{'):
+        fields = json.loads(text)
+        cells = fields.pop('board')
+    elif text.startswith('['):
+        cells = json.loads(text)
+    else:
+        cells = [int(cell) for cell in text.replace(',', ' ').split()]
+    board = np.array(cells)
+    if board.ndim == 1:
+        size = math.isqrt(board.size)
+        if size * size != board.size:
+            raise ValueError(f"{board.size} cells is not a square board")
+        board = board.reshape(size, size)
+    if board.ndim != 2 or board.shape[0] != board.shape[1]:
+        raise ValueError(f"board of shape {board.shape} is not square")
+    if not MIN_GRID_SIZE <= board.shape[0] <= MAX_GRID_SIZE:
+        raise ValueError(f"boards must be {MIN_GRID_SIZE}x{MIN_GRID_SIZE} to {MAX_GRID_SIZE}x{MAX_GRID_SIZE}")
+    if board.dtype.kind not in 'iu':
+        raise ValueError("tiles must be integers")
+    tiles = board[board != 0]
+    largest = max_tile(board.shape[0])
+    if np.any((tiles < 2) | (tiles > largest) | (tiles & (tiles - 1) != 0)):
+        raise ValueError(f"tiles must be 0 or powers of two from 2 to {largest} on this board")
+    return board.astype(np.int32), fields
+
+
+def agent(config, size):
+    # One agent per config, board size and process, so its search buffers
+    # are allocated once rather than per board.
+    key = json.dumps(config, sort_keys=True), size
+    if key not in _agents:
+        _agents[key] = AI2048(dict(config, grid_size=size, variable_depth=False))
+    return _agents[key]
+
+
+def analyze_line(task):
+    config, line_number, line = task
+    result = {'line': line_number}
+    try:
+        board, fields = parse_board(line)
+        result.update(fields)
+        ai = agent(config, board.shape[0])
+        # Boards are independent, and node counts should not depend on which
+        # boards a worker happened to see before.
+        ai.cache.clear()
+        start = time.perf_counter()
+        value, action = ai.search(board, ai.algo, ai.depth)
+        elapsed = time.perf_counter() - start
+    except (ValueError, KeyError, TypeError, IndexError, OverflowError) as error:
+        result['error'] = str(error)
+        return result
+    result.update({
+        'best_move': action,
+        # Lost positions score -inf, which JSON has no spelling for.
+        'value': float(value) if value is not None and math.isfinite(value) else None,
+        'nodes': ai.nodes,
+        'time': elapsed
+    })
+    return result
+
+
+def analyze_chunk(tasks):
+    return [analyze_line(task) for task in tasks]
+
+
+def read_tasks(stream, config):
+    for line_number, line in enumerate(stream, 1):
+        if line.strip():
+            yield config, line_number, line
+
+
+def write_results(output, results):
+    for result in results:
+        output.write(json.dumps(result) + '\n')
+    output.flush()
+
+
+def analyze(stream, output, config, processes=None, batch_size=256):
+    tasks = read_tasks(stream, config)
+    if processes == 1:
+        for task in tasks:
+            output.write(json.dumps(analyze_line(task)) + '\n')
+        return
+    # Pool.imap would pull the whole input into its task queue, so at most
+    # batch_size boards are in flight: a new chunk is queued as soon as the
+    # oldest one is written, and one slow board holds up only the output.
+    chunk_size = max(1, batch_size // 64)
+    chunks = iter(lambda: list(itertools.islice(tasks, chunk_size)), [])
+    pending = collections.deque()
+    # Boards of any size can turn up, so every size with dense tables is shared.
+    with share_row_tables(range(MIN_GRID_SIZE, DENSE_ROW_LENGTH + 1)) as tables, tables.pool(processes) as pool:
+        for chunk in chunks:
+            pending.append(pool.apply_async(analyze_chunk, (chunk,)))
+            if len(pending) * chunk_size >= batch_size:
+                write_results(output, pending.popleft().get())
+        while pending:
+            write_results(output, pending.popleft().get())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyze saved 2048 positions in bulk")
+    parser.add_argument('input', nargs='?', default='-', help="file of boards, one per line; - for stdin")
+    parser.add_argument('--output', default='-', help="JSON lines output; - for stdout")
+    parser.add_argument('--config', help="agent config JSON; the options below override it")
+    parser.add_argument('--algorithm', choices=['expectimax', 'minimax', 'alphabeta'])
+    parser.add_argument('--depth', type=int)
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--batch-size', type=int, default=256, help="boards in flight at once")
+    args = parser.parse_args()
+
+    config = load_config_file(args.config)
+    if args.algorithm:
+        config['algorithm'] = args.algorithm
+    if args.depth:
+        config['depth'] = args.depth
+    source = sys.stdin if args.input == '-' else open(args.input)
+    sink = sys.stdout if args.output == '-' else open(args.output, 'w')
+    with source, sink:
+        analyze(source, sink, config, args.processes, args.batch_size)
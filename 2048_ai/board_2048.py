@@ -0,0 +1,449 @@
+import os
+import tempfile
+import numpy as np
+
+ACTIONS = ('up', 'down', 'left', 'right')
+ACTION_BITS = {action: 1 << i for i, action in enumerate(ACTIONS)}
+
+TILE_VALUES = np.array([0] + [1 << k for k in range(1, 32)], dtype=np.int64)
+
+TABLE_NAMES = ('left_exp', 'right_exp', 'can')
+# The dense tables key rows by 4-bit exponents, so they hold tiles up to
+# 32768; a board with a bigger tile is looked up in the wide tables below.
+MAX_TABLE_EXPONENT = 15
+TABLE_VERSION = 3
+CAN_LEFT, CAN_RIGHT = 1, 2
+MASK_MOVE_COUNTS = [bin(mask).count('1') for mask in range(16)]
+
+# Rows of length n are keyed by their tile exponents packed into one
+# integer, first cell in the lowest bits, so every row (or column) maps to
+# one entry. Up to DENSE_ROW_LENGTH that is a table of 16 ** n entries (1M
+# rows for 5x5) at 4 bits per cell. Longer rows would not fit, and 4 bits
+# stop at 32768; both get "wide" tables instead, packed 5 bits per cell
+# and slid on demand and memoised.
+DENSE_ROW_LENGTH = 5
+# Formation weights reach 2 ** (n * n); past 6x6 they overflow int64.
+MIN_GRID_SIZE, MAX_GRID_SIZE = 2, 6
+CACHE_DIR = os.environ.get('AI2048_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', '2048_ai'))
+
+
+def key_bits(size, wide=False):
+    return 5 if wide or size > DENSE_ROW_LENGTH else 4
+
+
+def row_weights(size, wide=False):
+    return (1 << key_bits(size, wide)) ** np.arange(size, dtype=np.intp)
+
+
+def unpack_rows(keys, size, wide=False):
+    bits = key_bits(size, wide)
+    return (keys[:, None] >> (bits * np.arange(size))) & ((1 << bits) - 1)
+
+
+def exponent_dtype(size):
+    # 4x4 tables match SearchBoard's intp board so np.take never casts; the
+    # larger dense tables use bytes to keep 5x5 at ~11 MB instead of ~80 MB.
+    return np.intp if size <= 4 else np.uint8
+
+
+def slide_row_left(row):
+    non_zero = [value for value in row if value != 0]
+    new_row, j = [], 0
+    while j < len(non_zero):
+        if j < len(non_zero) - 1 and non_zero[j] == non_zero[j + 1]:
+            new_row.append(2 * non_zero[j])
+            j += 2
+        else:
+            new_row.append(non_zero[j])
+            j += 1
+    while len(new_row) < len(row):
+        new_row.append(0)
+    return new_row
+
+
+def compact_left(exponents):
+    order = np.argsort(exponents == 0, axis=1, kind='stable')
+    return np.take_along_axis(exponents, order, axis=1)
+
+
+def slide_exponents_left(exponents):
+    # Slides many rows at once: compact, merge equal neighbours once from the
+    # left, compact again.
+    exponents = compact_left(exponents)
+    for j in range(exponents.shape[1] - 1):
+        merge = (exponents[:, j] != 0) & (exponents[:, j] == exponents[:, j + 1])
+        exponents[merge, j] += 1
+        exponents[merge, j + 1] = 0
+    return compact_left(exponents)
+
+
+def build_row_tables(size=4):
+    exponents = unpack_rows(np.arange(16 ** size, dtype=np.int64), size)
+    left = slide_exponents_left(exponents)
+    right = slide_exponents_left(exponents[:, ::-1])[:, ::-1]
+    can_left = np.any(left != exponents, axis=1)
+    can_right = np.any(right != exponents, axis=1)
+    return {
+        'left_exp': np.ascontiguousarray(left, dtype=exponent_dtype(size)),
+        'right_exp': np.ascontiguousarray(right, dtype=exponent_dtype(size)),
+        'can': (can_left * CAN_LEFT | can_right * CAN_RIGHT).astype(np.uint8),
+    }
+
+
+class LazyRowTable:
+    # Stands in for a dense table when 16 ** n rows would not fit. It offers
+    # the two access paths the dense arrays are used through: fancy indexing
+    # and take(..., out=...).
+    def __init__(self, size, name, memo):
+        self.size = size
+        self.name = name
+        self.memo = memo
+
+    def row(self, key):
+        entry = self.memo.get(key)
+        if entry is None:
+            exponents = unpack_rows(np.array([key], dtype=np.int64), self.size, wide=True)
+            left = slide_exponents_left(exponents)[0]
+            right = slide_exponents_left(exponents[:, ::-1])[0][::-1]
+            can = CAN_LEFT * bool(np.any(left != exponents[0])) | CAN_RIGHT * bool(np.any(right != exponents[0]))
+            entry = self.memo[key] = {'left_exp': left, 'right_exp': right, 'can': can}
+        return entry[self.name]
+
+    def __getitem__(self, keys):
+        return np.array([self.row(int(key)) for key in keys])
+
+    def take(self, keys, axis=None, out=None, mode=None):
+        for i, key in enumerate(keys):
+            out[i] = self.row(int(key))
+        return out
+
+
+def lazy_row_tables(size):
+    memo = {}
+    return {name: LazyRowTable(size, name, memo) for name in TABLE_NAMES}
+
+
+def table_path(name, size=4, cache_dir=None):
+    return os.path.join(cache_dir or CACHE_DIR, f"row{size}_{name}_v{TABLE_VERSION}.npy")
+
+
+def save_row_tables(tables, size=4, cache_dir=None):
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    for name in TABLE_NAMES:
+        # Write then rename so concurrent starts never see a partial file.
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.npy')
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, tables[name])
+        os.replace(tmp_path, table_path(name, size, cache_dir))
+
+
+def load_row_tables(size=4, cache_dir=None):
+    try:
+        return {name: np.load(table_path(name, size, cache_dir), mmap_mode='r') for name in TABLE_NAMES}
+    except (OSError, ValueError):
+        return None
+
+
+_row_tables = {}
+
+
+def row_tables(size=4, wide=False):
+    wide = wide or size > DENSE_ROW_LENGTH
+    tables = _row_tables.get((size, wide))
+    if tables is None:
+        if wide:
+            tables = lazy_row_tables(size)
+        else:
+            tables = load_row_tables(size)
+            if tables is None:
+                tables = build_row_tables(size)
+                try:
+                    save_row_tables(tables, size)
+                except OSError:
+                    pass
+        _row_tables[size, wide] = tables
+    return tables
+
+
+def install_row_tables(tables, size):
+    _row_tables[size, False] = tables
+
+
+def board_exponents(board):
+    return np.maximum(np.frexp(board)[1] - 1, 0)
+
+
+def needs_wide(board):
+    return int(board.max()) >= TILE_VALUES[MAX_TABLE_EXPONENT + 1]
+
+
+def row_keys(board, wide=False):
+    exponents = board_exponents(board).astype(np.intp)
+    weights = row_weights(board.shape[0], wide)
+    return exponents @ weights, weights @ exponents
+
+
+# The plain Python slide, kept as the reference check_engine tests against.
+def slide_moves(board):
+    successors = [
+        np.array([slide_row_left(list(col)) for col in board.T]).T,
+        np.array([slide_row_left(list(col[::-1]))[::-1] for col in board.T]).T,
+        np.array([slide_row_left(list(row)) for row in board]),
+        np.array([slide_row_left(list(row[::-1]))[::-1] for row in board])
+    ]
+    mask = 0
+    for index, new_board in enumerate(successors):
+        if np.array_equal(new_board, board):
+            successors[index] = None
+        else:
+            successors[index] = new_board.astype(board.dtype)
+            mask |= 1 << index
+    return mask, successors
+
+
+def move_mask(board):
+    wide = needs_wide(board)
+    tables = row_tables(board.shape[0], wide)
+    rows, cols = row_keys(board, wide)
+    row_bits = int(np.bitwise_or.reduce(tables['can'][rows]))
+    col_bits = int(np.bitwise_or.reduce(tables['can'][cols]))
+    return bits_to_mask(row_bits, col_bits)
+
+
+def bits_to_mask(row_bits, col_bits):
+    mask = 0
+    if col_bits & CAN_LEFT:
+        mask |= ACTION_BITS['up']
+    if col_bits & CAN_RIGHT:
+        mask |= ACTION_BITS['down']
+    if row_bits & CAN_LEFT:
+        mask |= ACTION_BITS['left']
+    if row_bits & CAN_RIGHT:
+        mask |= ACTION_BITS['right']
+    return mask
+
+
+def legal_moves(board):
+    wide = needs_wide(board)
+    tables = row_tables(board.shape[0], wide)
+    rows, cols = row_keys(board, wide)
+    mask = move_mask(board)
+    successors = [None] * 4
+    if mask & ACTION_BITS['up']:
+        successors[0] = TILE_VALUES[tables['left_exp'][cols]].T.astype(board.dtype)
+    if mask & ACTION_BITS['down']:
+        successors[1] = TILE_VALUES[tables['right_exp'][cols]].T.astype(board.dtype)
+    if mask & ACTION_BITS['left']:
+        successors[2] = TILE_VALUES[tables['left_exp'][rows]].astype(board.dtype)
+    if mask & ACTION_BITS['right']:
+        successors[3] = TILE_VALUES[tables['right_exp'][rows]].astype(board.dtype)
+    return mask, successors
+
+
+def get_successors(board):
+    _, successors = legal_moves(board)
+    return [(action, new_board) for action, new_board in zip(ACTIONS, successors) if new_board is not None]
+
+
+def mask_actions(mask):
+    return [action for action in ACTIONS if mask & ACTION_BITS[action]]
+
+
+def is_game_over(board):
+    return move_mask(board) == 0
+
+
+def snake_weights(size):
+    # Snake-ordered powers of two from the top-left corner; for 4x4 this is
+    # the original hand-written formation matrix.
+    weights = np.zeros((size, size), dtype=np.int64)
+    rank = size * size
+    for i in range(size):
+        columns = range(size) if i % 2 == 0 else range(size - 1, -1, -1)
+        for j in columns:
+            weights[i, j] = 1 << rank
+            rank -= 1
+    return weights
+
+
+def cell_neighbours(size):
+    return [
+        [row * size + col for row, col in ((i - 1, j), (i + 1, j), (i, j - 1), (i, j + 1))
+         if 0 <= row < size and 0 <= col < size]
+        for i in range(size) for j in range(size)
+    ]
+
+
+def corner_distances(size):
+    edge = size - 1
+    return [min(i, edge - i) + min(j, edge - j) for i in range(size) for j in range(size)]
+
+
+class SearchBoard:
+    # One mutable board of tile exponents for make/unmake search. Moves are
+    # applied in place through the exponent row tables and undone from a
+    # per-ply copy; spawns are written into a cell and cleared again. All
+    # scratch arrays, and the views into them, are created up front so the
+    # search itself allocates no arrays.
+    def __init__(self, depth=8, size=4):
+        self.size = size
+        self.cell_count = size * size
+        # Flat cell indices are row-major. all_cells pairs every cell with
+        # unit weight: the exact expansion of a chance node.
+        self.all_cells = [(cell, 1) for cell in range(self.cell_count)]
+        self.neighbours = cell_neighbours(size)
+        self.corner_distance = corner_distances(size)
+        self.wide = False
+        self.weights = row_weights(size)
+        self.tables = row_tables(size)
+        self.exponents = np.zeros((size, size), dtype=np.intp)
+        self.cells = self.exponents.reshape(self.cell_count)
+        self.columns = self.exponents.T
+        self.values = np.zeros(self.cell_count, dtype=np.int64)
+        self.value_grid = self.values.reshape(size, size)
+        self.value_left = self.value_grid[:, :-1]
+        self.value_right = self.value_grid[:, 1:]
+        self.value_top = self.value_grid[:-1, :]
+        self.value_bottom = self.value_grid[1:, :]
+        self.horizontal = np.zeros((size, size - 1), dtype=np.int64)
+        self.vertical = np.zeros((size - 1, size), dtype=np.int64)
+        self.horizontal_mask = np.zeros((size, size - 1), dtype=bool)
+        self.vertical_mask = np.zeros((size - 1, size), dtype=bool)
+        self.can_rows = np.zeros(size, dtype=np.uint8)
+        self.can_cols = np.zeros(size, dtype=np.uint8)
+        self.depth = -1
+        self.resize(depth)
+
+    def resize(self, depth):
+        if depth <= self.depth:
+            return
+        self.depth = depth
+        plies = depth + 1
+        size = self.size
+        self.undo = [np.zeros((size, size), dtype=np.intp) for _ in range(plies)]
+        self.row_keys = [np.zeros(size, dtype=np.intp) for _ in range(plies)]
+        self.col_keys = [np.zeros(size, dtype=np.intp) for _ in range(plies)]
+        self.empty = [np.zeros(self.cell_count, dtype=bool) for _ in range(plies)]
+
+    def load(self, board):
+        np.copyto(self.exponents, board_exponents(board))
+        # Two 32768s can merge into a 65536 during the search, which the
+        # 4-bit keys cannot hold, so such boards search on the wide tables.
+        self.set_wide(int(self.cells.max()) >= MAX_TABLE_EXPONENT)
+
+    def set_wide(self, wide):
+        if wide != self.wide:
+            self.wide = wide
+            self.weights = row_weights(self.size, wide)
+            self.tables = row_tables(self.size, wide)
+
+    def to_board(self):
+        np.take(TILE_VALUES, self.cells, out=self.values, mode='clip')
+        return self.value_grid.astype(np.int32)
+
+    def key(self):
+        return self.exponents.tobytes()
+
+    def move_mask(self, ply):
+        can = self.tables['can']
+        rows, cols = self.row_keys[ply], self.col_keys[ply]
+        np.dot(self.exponents, self.weights, out=rows)
+        np.dot(self.weights, self.exponents, out=cols)
+        can.take(rows, out=self.can_rows, mode='clip')
+        can.take(cols, out=self.can_cols, mode='clip')
+        return bits_to_mask(int(np.bitwise_or.reduce(self.can_rows)), int(np.bitwise_or.reduce(self.can_cols)))
+
+    # make_move relies on the keys move_mask stored for the same ply.
+    def make_move(self, ply, action_index):
+        tables = self.tables
+        np.copyto(self.undo[ply], self.exponents)
+        match action_index:
+            case 0:
+                tables['left_exp'].take(self.col_keys[ply], axis=0, out=self.columns, mode='clip')
+            case 1:
+                tables['right_exp'].take(self.col_keys[ply], axis=0, out=self.columns, mode='clip')
+            case 2:
+                tables['left_exp'].take(self.row_keys[ply], axis=0, out=self.exponents, mode='clip')
+            case 3:
+                tables['right_exp'].take(self.row_keys[ply], axis=0, out=self.exponents, mode='clip')
+
+    def unmake_move(self, ply):
+        np.copyto(self.exponents, self.undo[ply])
+
+    def empty_cells(self, ply):
+        empty = self.empty[ply]
+        np.equal(self.cells, 0, out=empty)
+        return empty
+
+    def empty_count(self):
+        return self.cell_count - np.count_nonzero(self.cells)
+
+    def place(self, cell, exponent):
+        self.cells[cell] = exponent
+
+    def clear(self, cell):
+        self.cells[cell] = 0
+
+    def tile_values(self):
+        np.take(TILE_VALUES, self.cells, out=self.values, mode='clip')
+        return self.values
+
+    def max_value(self):
+        return int(TILE_VALUES[self.cells.max()])
+
+    def smoothness(self):
+        np.subtract(self.value_right, self.value_left, out=self.horizontal)
+        np.subtract(self.value_bottom, self.value_top, out=self.vertical)
+        np.abs(self.horizontal, out=self.horizontal)
+        np.abs(self.vertical, out=self.vertical)
+        np.not_equal(self.value_left, 0, out=self.horizontal_mask)
+        np.not_equal(self.value_top, 0, out=self.vertical_mask)
+        np.multiply(self.horizontal, self.horizontal_mask, out=self.horizontal)
+        np.multiply(self.vertical, self.vertical_mask, out=self.vertical)
+        return int(self.horizontal.sum()) + int(self.vertical.sum())
+
+
+def same_moves(mask, successors, reference_mask, reference):
+    return mask == reference_mask and all(
+        (a is None and b is None) or (a is not None and b is not None and np.array_equal(a, b))
+        for a, b in zip(successors, reference))
+
+
+def search_board_moves(search_board, board):
+    search_board.load(board)
+    mask = search_board.move_mask(0)
+    successors = [None] * 4
+    for index in range(4):
+        if mask & (1 << index):
+            search_board.make_move(0, index)
+            successors[index] = search_board.to_board()
+            search_board.unmake_move(0)
+    return mask, successors
+
+
+def check_engine(boards=2000, sizes=(3, 4, 5, 6), seed=0):
+    # Compares legal_moves and SearchBoard against the plain Python slide on
+    # random boards, including tiles past the range of the 4-bit row keys.
+    rng = np.random.default_rng(seed)
+    mismatches = 0
+    for size in sizes:
+        search_board = SearchBoard(1, size)
+        for _ in range(boards):
+            # Few distinct tiles per board, so rows merge often; half the
+            # boards stay within the tables, half go past them.
+            high = MAX_TABLE_EXPONENT + 1 + 2 * int(rng.random() < 0.5)
+            exponents = rng.choice(rng.integers(0, high, 4), (size, size))
+            board = TILE_VALUES[exponents].astype(np.int32)
+            reference = slide_moves(board)
+            if not same_moves(*legal_moves(board), *reference):
+                mismatches += 1
+            if not same_moves(*search_board_moves(search_board, board), *reference):
+                mismatches += 1
+    return mismatches
+
+
+if __name__ == "__main__":
+    mismatches = check_engine()
+    print(f"{mismatches} mismatches against the reference slide")
+    raise SystemExit(1 if mismatches else 0)
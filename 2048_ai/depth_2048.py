@@ -0,0 +1,70 @@
+import math
+import numpy as np
+from board_2048 import move_mask
+
+
+class DepthController:
+    def __init__(self, latency_target=0.25, min_depth=2, max_depth=6, tail_z=1.28, prior_strength=4.0):
+        self.latency_target = latency_target
+        self.min_depth = min_depth
+        self.max_depth = max_depth
+        self.tail_z = tail_z
+
+        # log(seconds) is modelled as linear in the design vector below. The
+        # prior encodes a branching factor of legal moves per max ply and
+        # 2 * empty cells per chance ply, at roughly 20 microseconds per node.
+        prior = np.array([math.log(2e-5), 1.0, 1.0, 0.0, math.log(2), 0.0])
+        self.precision = prior_strength * np.eye(len(prior))
+        self.moment = self.precision @ prior
+        self.weights = prior
+        self.residual_var = 0.5
+        self.samples = 0
+        self.deepest_observed = min_depth
+
+    def board_features(self, board):
+        empty = int(np.count_nonzero(board == 0))
+        distinct = len(np.unique(board[board > 0]))
+        legal = bin(move_mask(board)).count('1')
+        return empty, distinct, legal
+
+    def design(self, features, depth):
+        empty, distinct, legal = features
+        max_plies, chance_plies = (depth + 1) // 2, depth // 2
+        return np.array([
+            1.0,
+            max_plies * math.log(max(legal, 1)),
+            chance_plies * math.log1p(empty),
+            max_plies,
+            chance_plies,
+            math.log1p(distinct)
+        ])
+
+    def predict(self, features, depth):
+        return math.exp(self.design(features, depth) @ self.weights)
+
+    def predict_tail(self, features, depth):
+        log_cost = self.design(features, depth) @ self.weights
+        return math.exp(log_cost + self.tail_z * math.sqrt(self.residual_var))
+
+    def choose_depth(self, board):
+        features = self.board_features(board)
+        depth = self.min_depth
+        # Only extrapolate one ply past anything that has actually been timed.
+        ceiling = min(self.max_depth, self.deepest_observed + 1)
+        for candidate in range(self.min_depth + 1, ceiling + 1):
+            if self.predict_tail(features, candidate) > self.latency_target:
+                break
+            depth = candidate
+        return depth, features
+
+    def observe(self, features, depth, elapsed):
+        x = self.design(features, depth)
+        y = math.log(max(elapsed, 1e-6))
+        residual = y - x @ self.weights
+        self.samples += 1
+        self.deepest_observed = max(self.deepest_observed, depth)
+        rate = max(1.0 / self.samples, 0.05)
+        self.residual_var += rate * (residual * residual - self.residual_var)
+        self.precision += np.outer(x, x)
+        self.moment += x * y
+        self.weights = np.linalg.solve(self.precision, self.moment)
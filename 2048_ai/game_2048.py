@@ -1,14 +1,25 @@
-import pygame
 import numpy as np
-import random
 import sys
+from board_2048 import move_mask
+
+pygame = None
+
+
+def load_pygame():
+    global pygame
+    if pygame is None:
+        import pygame as module
+        pygame = module
+    return pygame
+
 
 class Game2048:
-    def __init__(self, width=600, height=700):
+    def __init__(self, width=600, height=700, render=True, seed=None, grid_size=4):
         self.width = width
         self.height = height
-        self.grid_size = 4
-        self.cell_size = 120
+        self.grid_size = grid_size
+        # Keep the grid 480 pixels across, whatever the number of cells.
+        self.cell_size = 480 // grid_size
         self.cell_padding = 10
         self.grid_padding = 50
 
@@ -41,6 +52,22 @@ class Game2048:
         self.text_light = (119, 110, 101)
         self.text_dark = (249, 246, 242)
 
+        self.render = render
+        self.rng = np.random.default_rng(seed)
+        if render:
+            self.init_display()
+
+        self.board = np.zeros((self.grid_size, self.grid_size), dtype=np.int32)
+        self.score = 0
+        self.game_over = False
+        self.won = False
+
+        self.reset_game()
+        if render:
+            pygame.init()
+
+    def init_display(self):
+        load_pygame()
         self.screen = pygame.display.set_mode((self.width, self.height))
         pygame.display.set_caption("2048 Game")
 
@@ -49,16 +76,8 @@ class Game2048:
         self.font_medium = pygame.font.Font(None, 36)
         self.font_small = pygame.font.Font(None, 24)
 
-        self.board = np.zeros((4, 4), dtype=np.int32)
-        self.score = 0
-        self.game_over = False
-        self.won = False
-
-        self.reset_game()
-        pygame.init()
-
     def reset_game(self):
-        self.board = np.zeros((4, 4), dtype=np.int32)
+        self.board = np.zeros((self.grid_size, self.grid_size), dtype=np.int32)
         self.score = 0
         self.game_over = False
         self.won = False
@@ -71,16 +90,18 @@ class Game2048:
     def add_random_tile(self):
         empty_cells = np.argwhere(self.board == 0)
         if len(empty_cells) > 0:
-            idx = np.random.choice(len(empty_cells))
+            # Always two uniform draws per spawn, so games sharing a seed
+            # see the same random stream whatever their boards look like.
+            idx = int(self.rng.random() * len(empty_cells))
             x, y = empty_cells[idx]
-            value = 2 if random.random() < 0.9 else 4
+            value = 2 if self.rng.random() < 0.9 else 4
             self.board[x, y] = value
 
     def move_left(self):
         new_board = self.board.copy()
         score_gained = 0
 
-        for i in range(4):
+        for i in range(self.grid_size):
             row = new_board[i, :]
             non_zero = row[row != 0]
 
@@ -96,7 +117,7 @@ class Game2048:
                     merged_row.append(non_zero[j])
                     j += 1
 
-            while len(merged_row) < 4:
+            while len(merged_row) < self.grid_size:
                 merged_row.append(0)
 
             new_board[i, :] = merged_row
@@ -127,18 +148,7 @@ class Game2048:
         return changed
 
     def is_game_over(self):
-        if np.any(self.board == 0):
-            return False
-
-        for i in range(4):
-            for j in range(4):
-                current = self.board[i, j]
-                if j < 3 and current == self.board[i, j + 1]:
-                    return False
-                if i < 3 and current == self.board[i + 1, j]:
-                    return False
-
-        return True
+        return move_mask(self.board) == 0
 
     def handle_move(self, direction):
         if self.game_over:
@@ -189,6 +199,10 @@ class Game2048:
             self.screen.blit(text, text_rect)
 
     def draw(self):
+        self.draw_board()
+        pygame.display.flip()
+
+    def draw_board(self):
         self.screen.fill((250, 248, 239))
 
         title = self.font_large.render("2048", True, (119, 110, 101))
@@ -201,8 +215,8 @@ class Game2048:
                               self.grid_width + 20, self.grid_height + 20)
         pygame.draw.rect(self.screen, self.background_color, grid_bg, border_radius=6)
 
-        for i in range(4):
-            for j in range(4):
+        for i in range(self.grid_size):
+            for j in range(self.grid_size):
                 self.draw_cell(j, i, self.board[i, j])
 
         if self.won and not self.game_over:
@@ -215,8 +229,6 @@ class Game2048:
             msg_rect = msg.get_rect(center=(self.width // 2, 600))
             self.screen.blit(msg, msg_rect)
 
-        pygame.display.flip()
-
     def run(self):
         clock = pygame.time.Clock()
         running = True
@@ -0,0 +1,70 @@
+import copy
+import threading
+import numpy as np
+from board_2048 import ACTIONS, SearchBoard, legal_moves
+
+
+class Ponderer:
+    # Searches the positions the next spawn can produce while the current
+    # move is on screen. It runs on a shallow copy of the agent, so the two
+    # share the search cache but not the search board; whatever it finishes
+    # is a cache hit for the agent's next root search.
+    def __init__(self, ai):
+        self.ai = ai
+        self.helper = copy.copy(ai)
+        self.helper.search_board = SearchBoard(ai.search_board.depth, ai.grid_size)
+        self.helper.progress = None
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.current = None
+        self.searched = []
+
+    def start(self, board, action, algorithm, depth):
+        _, successors = legal_moves(board)
+        afterstate = successors[ACTIONS.index(action)]
+        helper = self.helper
+        helper.cache = self.ai.cache
+        helper.cache_algorithm = algorithm
+        # Entries are tagged with the generation of the search they belong to.
+        helper.generation = self.ai.generation + 1
+        helper.node_budget = self.ai.node_budget
+        self.stopped.clear()
+        self.current = None
+        self.searched = []
+        self.thread = threading.Thread(target=self.run, args=(afterstate, algorithm, depth), daemon=True)
+        self.thread.start()
+
+    def spawns(self, afterstate):
+        # A 2 is nine times as likely as a 4 in any cell, so every 2 comes first.
+        cells = list(zip(*np.nonzero(afterstate == 0)))
+        for value in (2, 4):
+            for cell in cells:
+                board = afterstate.copy()
+                board[cell] = value
+                yield board
+
+    def run(self, afterstate, algorithm, depth):
+        for board in self.spawns(afterstate):
+            with self.lock:
+                if self.stopped.is_set():
+                    break
+                self.current = board
+            self.helper.search_position(board, algorithm, depth)
+            self.searched.append(board)
+        self.current = None
+
+    def hand_over(self, board):
+        # The real spawn is known: let the ponderer finish the position if it
+        # is on it, otherwise cut the search short through the node limit.
+        # Returns whether the position was one the ponderer searched.
+        if self.thread is None:
+            return False
+        with self.lock:
+            self.stopped.set()
+            if self.current is None or not np.array_equal(self.current, board):
+                self.helper.node_budget = 0
+                self.helper.node_limit = 0
+        self.thread.join()
+        self.thread = None
+        return any(np.array_equal(searched, board) for searched in self.searched)
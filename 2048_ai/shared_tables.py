@@ -0,0 +1,88 @@
+from multiprocessing import Pool, shared_memory
+import numpy as np
+import board_2048
+
+ALIGNMENT = 64
+
+
+class SharedTables:
+    def __init__(self, shm, layout, owner):
+        self.shm = shm
+        self.layout = layout
+        self.owner = owner
+        self.arrays = {
+            name: np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for name, (dtype, shape, offset) in layout.items()
+        }
+        if not owner:
+            for array in self.arrays.values():
+                array.flags.writeable = False
+
+    @classmethod
+    def create(cls, arrays):
+        layout, size = {}, 0
+        for name, array in arrays.items():
+            size = -(-size // ALIGNMENT) * ALIGNMENT
+            layout[name] = (array.dtype.str, array.shape, size)
+            size += array.nbytes
+        shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        tables = cls(shm, layout, owner=True)
+        for name, array in arrays.items():
+            tables.arrays[name][...] = array
+        return tables
+
+    @classmethod
+    def attach(cls, handle):
+        name, layout = handle
+        return cls(shared_memory.SharedMemory(name=name), layout, owner=False)
+
+    @property
+    def handle(self):
+        return self.shm.name, self.layout
+
+    @property
+    def nbytes(self):
+        return self.shm.size
+
+    def pool(self, processes=None):
+        return Pool(processes, initializer=init_worker, initargs=(self.handle,))
+
+    def close(self):
+        # Views into the buffer must go before the mapping can be closed.
+        self.arrays = {}
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+_attached = None
+
+
+def init_worker(handle):
+    global _attached
+    _attached = SharedTables.attach(handle)
+    tables = {}
+    for key, array in _attached.arrays.items():
+        size, name = key.split('/')
+        tables.setdefault(int(size), {})[name] = array
+    for size, arrays in tables.items():
+        board_2048.install_row_tables(arrays, size)
+
+
+def share_row_tables(sizes):
+    # One block holds the dense tables of every size; larger boards fill
+    # their tables lazily, so each process keeps its own. The owner keeps
+    # using its own tables: the shared block is unmapped on close, and
+    # nothing in this process may still point into it.
+    arrays = {}
+    for size in sorted(set(sizes)):
+        if size <= board_2048.DENSE_ROW_LENGTH:
+            for name, table in board_2048.row_tables(size).items():
+                arrays[f"{size}/{name}"] = table
+    return SharedTables.create(arrays)
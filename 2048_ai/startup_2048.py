@@ -0,0 +1,64 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import ai_2048
+imported = time.perf_counter()
+import numpy as np
+from board_2048 import move_mask
+move_mask(np.zeros((4, 4), dtype=np.int32))
+ready = time.perf_counter()
+print(json.dumps({
+    'import': imported - start,
+    'tables': ready - imported,
+    'total': ready - start,
+    'gui_modules': sorted(m for m in ('pygame', 'tkinter') if m in sys.modules),
+}))
+"""
+
+
+def probe(cache_dir):
+    env = dict(os.environ, AI2048_CACHE_DIR=cache_dir)
+    output = subprocess.run([sys.executable, '-c', PROBE], env=env, cwd=os.path.dirname(os.path.abspath(__file__)),
+                            capture_output=True, text=True, check=True).stdout
+    return json.loads(output)
+
+
+def measure(runs):
+    cache_dir = tempfile.mkdtemp(prefix='2048_ai_cache_')
+    try:
+        results = {'cold': [], 'warm': []}
+        for _ in range(runs):
+            shutil.rmtree(cache_dir, ignore_errors=True)
+            results['cold'].append(probe(cache_dir))
+            results['warm'].append(probe(cache_dir))
+        return results
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+
+def report(results):
+    for kind, samples in results.items():
+        best = min(samples, key=lambda sample: sample['total'])
+        print(f"{kind:>5}: total {best['total'] * 1000:7.1f} ms "
+              f"(import {best['import'] * 1000:6.1f} ms, tables {best['tables'] * 1000:6.1f} ms), "
+              f"GUI modules loaded: {', '.join(best['gui_modules']) or 'none'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the headless search core")
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--json', action='store_true', help="print raw samples as JSON")
+    args = parser.parse_args()
+    results = measure(args.runs)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
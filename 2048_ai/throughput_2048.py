@@ -0,0 +1,69 @@
+import argparse
+import json
+import time
+import numpy as np
+import board_2048
+from ai_2048 import AI2048, load_config_file
+from game_2048 import Game2048
+
+
+def table_bytes(tables):
+    return sum(table.nbytes for table in tables.values() if isinstance(table, np.ndarray))
+
+
+def measure(config, size, moves, seed):
+    config = dict(config, grid_size=size, variable_depth=False)
+    start = time.perf_counter()
+    tables = board_2048.row_tables(size)
+    tables_time = time.perf_counter() - start
+
+    ai = AI2048(config)
+    game = Game2048(render=False, seed=seed, grid_size=size)
+    nodes, search_time, played = 0, 0.0, 0
+    while played < moves and not game.is_game_over():
+        start = time.perf_counter()
+        _, action = ai.search(game.get_board(), ai.algo, ai.depth)
+        search_time += time.perf_counter() - start
+        nodes += ai.nodes
+        if not action:
+            break
+        game.handle_move(action)
+        played += 1
+
+    memoised = len(tables['can'].memo) if size > board_2048.DENSE_ROW_LENGTH else None
+    return {
+        'size': size,
+        'moves': played,
+        'nodes': nodes,
+        'nodes_per_second': nodes / search_time if search_time else 0.0,
+        'seconds_per_move': search_time / played if played else 0.0,
+        'tables_seconds': tables_time,
+        'table_bytes': table_bytes(tables),
+        'memoised_rows': memoised
+    }
+
+
+def report(results):
+    for result in results:
+        tables = f"{result['table_bytes'] / 2 ** 20:6.1f} MB"
+        if result['memoised_rows'] is not None:
+            tables = f"{result['memoised_rows']:6d} rows memoised"
+        print(f"{result['size']}x{result['size']}: {result['nodes_per_second']:9.0f} nodes/s, "
+              f"{result['seconds_per_move'] * 1000:8.1f} ms/move over {result['moves']} moves, "
+              f"tables {tables} (ready in {result['tables_seconds']:.2f}s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure search throughput as the board grows")
+    parser.add_argument('--config', help="agent config JSON; grid_size is overridden")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[4, 5, 6])
+    parser.add_argument('--moves', type=int, default=50, help="moves searched per board size")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help="print raw results as JSON")
+    args = parser.parse_args()
+    config = load_config_file(args.config)
+    results = [measure(config, size, args.moves, args.seed) for size in args.sizes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        report(results)
@@ -0,0 +1,292 @@
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import socket
+import socketserver
+import threading
+import time
+import numpy as np
+from ai_2048 import AI2048, load_config_file
+from shared_tables import init_worker, share_row_tables
+
+# Coordinator and workers exchange newline-delimited JSON messages:
+#   worker -> {"type": "ready"} or {"type": "result", "shard": id, "results": [...]}
+#   coordinator -> {"type": "shard", "shard": id, "config": {...}, "games": [[index, seed], ...]}
+#                  or {"type": "done"}
+DEFAULT_PORT = 20480
+
+
+def send_message(stream, message):
+    stream.write((json.dumps(message) + '\n').encode())
+    stream.flush()
+
+
+def read_message(stream):
+    line = stream.readline()
+    return json.loads(line) if line else None
+
+
+class Tournament:
+    def __init__(self, configs, games, shard_size, seed=0, max_attempts=3):
+        self.configs = configs
+        self.max_attempts = max_attempts
+        self.shards = {}
+        for name, config in configs.items():
+            for start in range(0, games, shard_size):
+                indices = range(start, min(start + shard_size, games))
+                self.shards[len(self.shards)] = (name, [[index, seed + index] for index in indices])
+        self.pending = collections.deque(self.shards)
+        self.results = {name: {} for name in configs}
+        self.completed = set()
+        self.attempts = collections.Counter()
+        self.failed = set()
+        self.lock = threading.Lock()
+        self.finished = threading.Event()
+
+    def next_shard(self):
+        with self.lock:
+            while self.pending:
+                shard_id = self.pending.popleft()
+                if shard_id not in self.completed:
+                    return shard_id
+            return None
+
+    def requeue(self, shard_id):
+        with self.lock:
+            if shard_id in self.completed:
+                return
+            self.attempts[shard_id] += 1
+            if self.attempts[shard_id] < self.max_attempts:
+                self.pending.appendleft(shard_id)
+                return
+            # A shard that keeps timing out or killing workers is given up
+            # on rather than draining every worker in turn.
+            self.failed.add(shard_id)
+            self.mark_done(shard_id)
+
+    def mark_done(self, shard_id):
+        self.completed.add(shard_id)
+        if len(self.completed) == len(self.shards):
+            self.finished.set()
+
+    def complete(self, shard_id, results):
+        with self.lock:
+            # A shard retried after a timeout can finish twice; keep the first.
+            if shard_id in self.completed:
+                return
+            name, _ = self.shards[shard_id]
+            for index, score, max_tile in results:
+                self.results[name][index] = (score, max_tile)
+            self.mark_done(shard_id)
+
+    def summary(self):
+        summary = {}
+        for name, results in self.results.items():
+            scores = [score for score, _ in results.values()]
+            tiles = [max_tile for _, max_tile in results.values()]
+            summary[name] = {
+                'games': len(scores),
+                'mean_score': float(np.mean(scores)) if scores else None,
+                'max_tile': max(tiles) if tiles else None
+            }
+        return summary
+
+    def output(self):
+        return {
+            'configs': self.configs,
+            'results': {name: dict(sorted(results.items())) for name, results in self.results.items()},
+            'summary': self.summary(),
+            'failed_shards': {shard_id: self.shards[shard_id] for shard_id in sorted(self.failed)}
+        }
+
+
+class ShardHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        tournament = self.server.tournament
+        self.connection.settimeout(self.server.shard_timeout)
+        shard_id = None
+        try:
+            while True:
+                message = read_message(self.rfile)
+                if message is None:
+                    break
+                if message['type'] == 'result':
+                    tournament.complete(message['shard'], message['results'])
+                    shard_id = None
+                shard_id = tournament.next_shard()
+                if shard_id is None:
+                    # Nothing queued, but another worker may still die and
+                    # hand its shard back; wait for that or for the end.
+                    while shard_id is None and not tournament.finished.wait(0.5):
+                        shard_id = tournament.next_shard()
+                if shard_id is None:
+                    send_message(self.wfile, {'type': 'done'})
+                    break
+                name, games = tournament.shards[shard_id]
+                send_message(self.wfile, {'type': 'shard', 'shard': shard_id,
+                                          'config': tournament.configs[name], 'games': games})
+        except (OSError, ValueError, KeyError):
+            pass
+        finally:
+            if shard_id is not None:
+                tournament.requeue(shard_id)
+
+
+class CoordinatorServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self, address, tournament, shard_timeout):
+        super().__init__(address, ShardHandler)
+        self.tournament = tournament
+        self.shard_timeout = shard_timeout
+
+
+def coordinate(tournament, host, port, shard_timeout=None, local_workers=0, log=print):
+    with CoordinatorServer((host, port), tournament, shard_timeout) as server:
+        host, port = server.server_address[:2]
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        log(f"Coordinator on {host}:{port} with {len(tournament.shards)} shards")
+        workers = []
+        if local_workers:
+            # Spawned rather than forked: a forked worker would inherit the
+            # listening socket and keep it open after server_close().
+            context = multiprocessing.get_context('spawn')
+            grid_sizes = [config['grid_size'] for config in tournament.configs.values()]
+            workers.append(context.Process(target=run_workers, args=('127.0.0.1', port, local_workers, grid_sizes)))
+            workers[0].start()
+        start = time.perf_counter()
+        while not tournament.finished.wait(5):
+            log(f"  {len(tournament.completed)}/{len(tournament.shards)} shards done "
+                f"after {time.perf_counter() - start:.0f}s")
+        server.shutdown()
+        # Refuse new connections so reconnecting workers see the end.
+        server.server_close()
+        for worker in workers:
+            worker.join()
+    return tournament.output()
+
+
+def play_shard(config, games):
+    results = []
+    for index, seed in games:
+        score, max_tile = AI2048(config).play_headless(seed)
+        results.append([index, score, max_tile])
+    return results
+
+
+def connect(host, port, retries=50):
+    for attempt in range(retries):
+        try:
+            return socket.create_connection((host, port))
+        except OSError:
+            if attempt == retries - 1:
+                raise
+            time.sleep(0.1)
+
+
+def serve_shards(stream):
+    # Returns True once the coordinator says the tournament is done, False
+    # if the connection closed first.
+    send_message(stream, {'type': 'ready'})
+    while True:
+        message = read_message(stream)
+        if message is None:
+            return False
+        if message['type'] == 'done':
+            return True
+        results = play_shard(message['config'], message['games'])
+        send_message(stream, {'type': 'result', 'shard': message['shard'], 'results': results})
+
+
+def run_worker(host, port):
+    connected = False
+    while True:
+        try:
+            sock = connect(host, port)
+        except OSError:
+            if not connected:
+                raise
+            # Reachable before, gone now: the coordinator has finished.
+            return
+        connected = True
+        try:
+            with sock, sock.makefile('rwb') as stream:
+                if serve_shards(stream):
+                    return
+        except (OSError, ValueError):
+            # Dropped mid-shard, e.g. after a shard timeout; the coordinator
+            # has already handed the shard on, so just ask for another.
+            pass
+
+
+def run_attached_worker(handle, host, port):
+    init_worker(handle)
+    run_worker(host, port)
+
+
+def run_workers(host, port, processes, grid_sizes=(4,)):
+    if processes == 1:
+        run_worker(host, port)
+        return
+    with share_row_tables(grid_sizes) as tables:
+        workers = [multiprocessing.Process(target=run_attached_worker, args=(tables.handle, host, port))
+                   for _ in range(processes)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+
+
+def load_configs(paths):
+    configs = {os.path.splitext(os.path.basename(path))[0]: load_config_file(path) for path in paths}
+    if not configs:
+        configs['default'] = load_config_file()
+    return configs
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a 2048 tournament across socket-connected workers")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    coordinator = subparsers.add_parser('coordinator', help="split a tournament into shards and serve them")
+    coordinator.add_argument('configs', nargs='*', help="config JSON files; one entry per file")
+    coordinator.add_argument('--games', type=int, default=10, help="games per config")
+    coordinator.add_argument('--shard-size', type=int, default=2)
+    coordinator.add_argument('--seed', type=int, default=0, help="seed of game 0; game i uses seed + i")
+    coordinator.add_argument('--host', default='0.0.0.0')
+    coordinator.add_argument('--port', type=int, default=DEFAULT_PORT)
+    coordinator.add_argument('--shard-timeout', type=float,
+                             help="seconds without a reply before a worker's shard is handed to another")
+    coordinator.add_argument('--max-attempts', type=int, default=3,
+                             help="times a shard is handed out before it is reported as failed")
+    coordinator.add_argument('--local-workers', type=int, default=0,
+                             help="also start this many worker processes on localhost")
+    coordinator.add_argument('--output', default='tournament_results.json')
+
+    worker = subparsers.add_parser('worker', help="play shards for a coordinator")
+    worker.add_argument('--host', default='127.0.0.1')
+    worker.add_argument('--port', type=int, default=DEFAULT_PORT)
+    worker.add_argument('--processes', type=int, default=os.cpu_count())
+    worker.add_argument('--grid-sizes', type=int, nargs='+', default=[4],
+                        help="board sizes of the tournament's configs, whose tables the processes share")
+
+    args = parser.parse_args()
+    if args.command == 'coordinator':
+        tournament = Tournament(load_configs(args.configs), args.games, args.shard_size, args.seed,
+                                args.max_attempts)
+        output = coordinate(tournament, args.host, args.port, args.shard_timeout, args.local_workers)
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+        for name, stats in output['summary'].items():
+            if not stats['games']:
+                print(f"{name}: no games finished")
+                continue
+            print(f"{name}: {stats['games']} games, mean score {stats['mean_score']:.0f}, "
+                  f"max tile {stats['max_tile']}")
+        if output['failed_shards']:
+            print(f"{len(output['failed_shards'])} shards failed after {args.max_attempts} attempts")
+    else:
+        run_workers(args.host, args.port, args.processes, args.grid_sizes)
@@ -0,0 +1,127 @@
+import argparse
+import copy
+import json
+import math
+import numpy as np
+from ai_2048 import AI2048, load_config_file
+from shared_tables import share_row_tables
+
+# Same ranges as the sliders in ai_2048_config_gui.
+WEIGHT_BOUNDS = {
+    'formation': (0.0, 5.0),
+    'empty': (0.0, 10.0),
+    'smooth': (0.0, 2.0)
+}
+
+
+def make_config(base_config, weights):
+    config = copy.deepcopy(base_config)
+    config['heuristic_weights'] = {key: round(float(value), 4) for key, value in weights.items()}
+    return config
+
+
+def sample_uniform(rng, count):
+    return [{key: rng.uniform(low, high) for key, (low, high) in WEIGHT_BOUNDS.items()} for _ in range(count)]
+
+
+def sample_gaussian(rng, count, elites):
+    # Cross-entropy style refinement: refit a diagonal Gaussian to the elites.
+    keys = list(WEIGHT_BOUNDS)
+    points = np.array([[elite[key] for key in keys] for elite in elites])
+    mean = points.mean(axis=0)
+    spread = np.array([high - low for low, high in WEIGHT_BOUNDS.values()])
+    std = np.maximum(points.std(axis=0), 0.05 * spread)
+    samples = []
+    for _ in range(count):
+        point = rng.normal(mean, std)
+        samples.append({key: float(np.clip(value, *WEIGHT_BOUNDS[key])) for key, value in zip(keys, point)})
+    return samples
+
+
+def play_game(task):
+    config, seed = task
+    return AI2048(config).play_headless(seed)
+
+
+def successive_halving(pool, base_config, candidates, seeds, min_games, eta, log):
+    results = [[] for _ in candidates]
+    survivors = list(range(len(candidates)))
+    eliminated = []
+    games = min_games
+    while True:
+        games = min(games, len(seeds))
+        tasks, owners = [], []
+        for index in survivors:
+            for seed in seeds[len(results[index]):games]:
+                tasks.append((make_config(base_config, candidates[index]), seed))
+                owners.append(index)
+        for index, result in zip(owners, pool.map(play_game, tasks)):
+            results[index].append(result)
+
+        survivors.sort(key=lambda index: np.mean([score for score, _ in results[index]]), reverse=True)
+        log(f"  rung: {len(survivors)} candidates x {games} games, "
+            f"best mean score {np.mean([score for score, _ in results[survivors[0]]]):.0f}")
+        if len(survivors) == 1 or games == len(seeds):
+            break
+        keep = max(1, math.ceil(len(survivors) / eta))
+        eliminated = survivors[keep:] + eliminated
+        survivors = survivors[:keep]
+        games *= eta
+    return survivors + eliminated, results
+
+
+def tune(base_config, rounds, candidates, strategy, min_games, max_games, eta, seed, processes, log=print):
+    rng = np.random.default_rng(seed)
+    seeds = [seed + i for i in range(max_games)]
+    best = None
+    elites = []
+    with share_row_tables([base_config['grid_size']]) as tables, tables.pool(processes) as pool:
+        for round_index in range(rounds):
+            if strategy == 'gaussian' and elites:
+                population = sample_gaussian(rng, candidates, elites)
+            else:
+                population = sample_uniform(rng, candidates)
+            if best is not None:
+                population[0] = best['weights']
+            log(f"Round {round_index + 1}/{rounds}")
+            ranking, results = successive_halving(pool, base_config, population, seeds, min_games, eta, log)
+            elites = [population[index] for index in ranking[:max(2, len(ranking) // eta)]]
+            winner = ranking[0]
+            scores = [score for score, _ in results[winner]]
+            # Winners with more games are trusted over lucky short runs.
+            candidate = {
+                'weights': population[winner],
+                'mean_score': float(np.mean(scores)),
+                'games': len(scores),
+                'max_tile': int(max(tile for _, tile in results[winner]))
+            }
+            if best is None or (candidate['games'], candidate['mean_score']) > (best['games'], best['mean_score']):
+                best = candidate
+            log(f"  best so far: {best['weights']} mean score {best['mean_score']:.0f} over {best['games']} games")
+    return best
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tune heuristic weights with successive halving")
+    parser.add_argument('--config', help="base config JSON (as saved by the config GUI)")
+    parser.add_argument('--output', default='tuned_config.json')
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--candidates', type=int, default=27)
+    parser.add_argument('--strategy', choices=['random', 'gaussian'], default='random')
+    parser.add_argument('--min-games', type=int, default=2)
+    parser.add_argument('--max-games', type=int, default=54)
+    parser.add_argument('--eta', type=int, default=3)
+    parser.add_argument('--depth', type=int, help="override the search depth used while tuning")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--processes', type=int)
+    args = parser.parse_args()
+
+    base_config = load_config_file(args.config)
+    if args.depth:
+        base_config['depth'] = args.depth
+
+    best = tune(base_config, args.rounds, args.candidates, args.strategy, args.min_games,
+                args.max_games, args.eta, args.seed, args.processes)
+    with open(args.output, 'w') as f:
+        json.dump(make_config(base_config, best['weights']), f, indent=2)
+    print(f"Saved best weights {best['weights']} to {args.output}")
@@ -0,0 +1,223 @@
+import argparse
+import json
+import multiprocessing
+import time
+import numpy as np
+from ai_2048 import AI2048, load_config_file
+from game_2048 import Game2048, load_pygame
+from ponder_2048 import Ponderer
+
+FPS = 60
+FAST_FORWARD = (1, 2, 5, 10, 25, 100)
+MIN_DELAY, MAX_DELAY = 0.0, 2.0
+GAME_OVER_HOLD = 2.0
+TEXT_COLOR = (119, 110, 101)
+HELP = "Space pause  S step  F fast-forward  Up/Down speed  Esc quit"
+
+# Progress slots the worker writes and the window reads every frame.
+PROGRESS_MOVE, PROGRESS_DEPTH, PROGRESS_NODES = range(3)
+
+
+def search_worker(config, connection, progress):
+    # Runs in its own process and answers (move, board) requests with
+    # (move, action, depth, nodes, seconds) until it receives None.
+    ai = AI2048(config)
+    ponderer = None
+    if ai.ponder and ai.reuse_search and ai.algo != 'alphabeta':
+        ponderer = Ponderer(ai)
+
+    def report(nodes):
+        progress[PROGRESS_DEPTH] = ai.last_depth
+        progress[PROGRESS_NODES] = nodes
+
+    ai.progress = report
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        move, board = request
+        pondered = ponderer.hand_over(board) if ponderer else False
+        progress[PROGRESS_MOVE] = move
+        progress[PROGRESS_NODES] = 0
+        start = time.perf_counter()
+        action = ai.select_action(board, ai.algo, ai.depth, pondered)
+        elapsed = time.perf_counter() - start
+        connection.send((move, action, ai.last_depth, ai.nodes, elapsed))
+        if ponderer and action:
+            ponderer.start(board, action, ai.algo, ai.last_depth)
+    if ponderer:
+        ponderer.hand_over(None)
+
+
+class VisualRunner:
+    # Plays with the search in a worker process so the window keeps running
+    # at full frame rate. The next move is requested as soon as the last one
+    # is applied, so searching overlaps with showing the board; replies are
+    # held back by the move delay, by pause, or applied back to back when
+    # fast-forwarding. Any worker speaking search_worker's protocol can drive
+    # the window.
+    def __init__(self, config, move_delay=0.5, search=search_worker):
+        self.config = config
+        self.search = search
+        self.grid_size = config.get('grid_size', 4)
+        self.move_delay = move_delay
+        self.fast_forward = 0
+        self.paused = False
+        self.steps = 0
+        self.worker = None
+        self.connection = None
+        self.progress = None
+
+    def start_worker(self):
+        self.connection, worker_connection = multiprocessing.Pipe()
+        self.progress = multiprocessing.Array('q', 3, lock=False)
+        self.worker = multiprocessing.Process(target=self.search,
+                                              args=(self.config, worker_connection, self.progress), daemon=True)
+        self.worker.start()
+
+    def stop_worker(self):
+        if self.worker is None:
+            return
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+        self.worker.join(1.0)
+        if self.worker.is_alive():
+            # Still inside a long search; nothing of it is needed any more.
+            self.worker.terminate()
+            self.worker.join()
+        self.worker = None
+
+    def render_every(self):
+        return FAST_FORWARD[self.fast_forward]
+
+    def handle_key(self, key, pygame):
+        if key == pygame.K_SPACE:
+            self.paused = not self.paused
+            self.steps = 0
+        elif key in (pygame.K_s, pygame.K_RIGHT):
+            self.paused = True
+            self.steps += 1
+        elif key == pygame.K_f:
+            self.fast_forward = (self.fast_forward + 1) % len(FAST_FORWARD)
+        elif key == pygame.K_UP:
+            self.move_delay = max(MIN_DELAY, self.move_delay / 2 if self.move_delay > 0.05 else 0.0)
+        elif key == pygame.K_DOWN:
+            self.move_delay = min(MAX_DELAY, self.move_delay * 2 if self.move_delay else 0.05)
+
+    def status(self, searching, search_start, last_search):
+        search = ""
+        if searching:
+            depth = self.progress[PROGRESS_DEPTH] or '?'
+            search = (f"Searching depth {depth}: {self.progress[PROGRESS_NODES]:,} nodes, "
+                      f"{time.perf_counter() - search_start:.1f}s")
+        elif last_search:
+            depth, nodes, elapsed = last_search
+            search = f"Depth {depth}: {nodes:,} nodes in {elapsed * 1000:.0f} ms"
+        if self.render_every() > 1:
+            mode = f"Drawing every {self.render_every()} moves"
+        else:
+            mode = f"{self.move_delay:.2f}s per move"
+        if self.paused:
+            mode += ", paused"
+        return search, mode
+
+    def draw(self, game, status, pygame):
+        game.draw_board()
+        for line, text in enumerate(status + (HELP,)):
+            game.screen.blit(game.font_small.render(text, True, TEXT_COLOR), (50, 80 + 22 * line))
+        pygame.display.flip()
+
+    def play(self, game):
+        pygame = load_pygame()
+        clock = pygame.time.Clock()
+        move = 0
+        pending = False
+        ready = None
+        search_start = 0.0
+        last_search = None
+        last_move_time = 0.0
+        game_over_time = None
+        while True:
+            redraw = self.render_every() == 1
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    return None
+                if event.type == pygame.KEYDOWN:
+                    if event.key == pygame.K_ESCAPE:
+                        return None
+                    if event.key in (pygame.K_n, pygame.K_r) and game.game_over:
+                        game_over_time = -GAME_OVER_HOLD
+                    self.handle_key(event.key, pygame)
+                    redraw = True
+
+            if game.game_over:
+                if game_over_time is None:
+                    game_over_time = time.perf_counter()
+                    redraw = True
+                elif time.perf_counter() - game_over_time >= GAME_OVER_HOLD:
+                    return int(game.score), int(np.max(game.board))
+
+            if not pending and ready is None and not game.game_over:
+                self.connection.send((move, game.get_board()))
+                pending = True
+                search_start = time.perf_counter()
+
+            if pending and self.connection.poll():
+                reply_move, action, depth, nodes, elapsed = self.connection.recv()
+                if reply_move == move:
+                    pending = False
+                    ready = (action,)
+                    last_search = (depth, nodes, elapsed)
+
+            delay = self.move_delay if self.render_every() == 1 else 0.0
+            due = time.perf_counter() - last_move_time >= delay
+            if ready is not None and due and (not self.paused or self.steps):
+                if self.paused:
+                    self.steps -= 1
+                (action,), ready = ready, None
+                if not action:
+                    game.game_over = True
+                else:
+                    game.handle_move(action)
+                move += 1
+                last_move_time = time.perf_counter()
+                if move % self.render_every() == 0 or game.game_over:
+                    redraw = True
+            if redraw:
+                self.draw(game, self.status(pending, search_start, last_search), pygame)
+            clock.tick(FPS)
+
+    def run(self, num_games=1, seed=None, output_file=None):
+        results = {}
+        self.start_worker()
+        try:
+            for i in range(num_games):
+                game = Game2048(seed=None if seed is None else seed + i, grid_size=self.grid_size)
+                result = self.play(game)
+                if result is None:
+                    break
+                results[i] = result
+        finally:
+            self.stop_worker()
+            load_pygame().quit()
+        if output_file:
+            with open(output_file, 'w') as f:
+                json.dump(results, f)
+        return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch the agent play with search in a worker process")
+    parser.add_argument('--config', help="agent config JSON (as saved by the config GUI)")
+    parser.add_argument('--games', type=int, help="defaults to num_games from the config")
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--move-delay', type=float, default=0.5, help="seconds each move stays on screen")
+    args = parser.parse_args()
+    config = load_config_file(args.config)
+    runner = VisualRunner(config, args.move_delay)
+    output_file = config['output_file'] if config['save_results'] else None
+    results = runner.run(args.games or config['num_games'], args.seed, output_file)
+    for i, (score, max_tile) in results.items():
+        print(f"Game {i + 1}: score {score}, max tile {max_tile}")